@@ -1,4 +1,10 @@
+import functools
 import heapq
+import json
+import time
+from array import array
+
+from openlist import OPEN_LISTS
 
 class Node:
     def __init__(self, state, parent=None, cost=0, heuristic=0):
@@ -12,115 +18,781 @@ class Node:
         return (self.cost + self.heuristic) < (other.cost + other.heuristic)
 
 
-def ucs_search(problem):
+class SearchStats:
+    # Opt-in instrumentation for the search engines: pass one as stats= to collect heap
+    # pushes/pops, stale pops, heuristic evaluations, successor calls and re-openings
+    # (expansions of a state that was already expanded), plus per-phase timers if timers=True.
+    # Without a collector the searches run their plain loops: the hot-path callables are only
+    # swapped for counting wrappers when one is given, and the other counters are derived
+    # from totals the searches keep anyway.
+    PHASES = ('push', 'pop', 'successors', 'heuristic')
+    
+    def __init__(self, timers=False):
+        self.calls = dict.fromkeys(self.PHASES, 0)
+        self.times = dict.fromkeys(self.PHASES, 0.0) if timers else None
+        self.expansions = 0
+        self.stale_pops = 0
+        self.reopenings = None
+    
+    def wrap(self, phase, fn):
+        calls = self.calls
+        if self.times is None:
+            def counted(*args):
+                calls[phase] += 1
+                return fn(*args)
+            return counted
+        
+        times = self.times
+        clock = time.perf_counter
+        
+        def timed(*args):
+            calls[phase] += 1
+            t0 = clock()
+            result = fn(*args)
+            times[phase] += clock() - t0
+            return result
+        return timed
+    
+    def record(self, expansions, closed_states=None, goal_popped=False):
+        # Every pop is a goal pop, a stale skip or an expansion
+        self.expansions = expansions
+        self.stale_pops = self.calls['pop'] - expansions - goal_popped
+        if closed_states is not None:
+            self.reopenings = expansions - closed_states
+    
+    def to_dict(self):
+        stats = {
+            'pushes': self.calls['push'],
+            'pops': self.calls['pop'],
+            'stale_pops': self.stale_pops,
+            'expansions': self.expansions,
+            'reopenings': self.reopenings,
+            'heuristic_evals': self.calls['heuristic'],
+            'successor_calls': self.calls['successors'],
+        }
+        if self.times is not None:
+            for phase in self.PHASES:
+                stats[f'time_{phase}_s'] = self.times[phase]
+        return stats
+    
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+
+def _search_event(kind, node, pushed, frontier, nodes_expanded, explored, steps, snapshot_every, top=None):
+    # One incremental 'running' event per pop:
+    # - 'expand': node.state was added to the explored set, `pushed` lists the new frontier states
+    # - 'stale': node.state was already explored at a lower or equal cost and was skipped
+    # Consumers rebuild the explored set from these deltas. With snapshot_every=N, every
+    # N-th event also carries a full 'explored_set' copy so a late consumer can resync.
+    # top is the next node to pop when the frontier is an open list rather than a heap of nodes.
+    event = {
+        'status': 'running',
+        'event': kind,
+        'state': node.state,
+        'cost': node.cost,
+        'pushed': pushed,
+        'frontier_size': len(frontier),
+        'expanded': nodes_expanded,
+        'current_node': top or (frontier[0] if frontier else None)
+    }
+    if snapshot_every and steps % snapshot_every == 0:
+        event['explored_set'] = explored.copy()
+    return event
+
+
+def _node_path(node):
+    path = []
+    curr = node
+    while curr:
+        path.append(curr.state)
+        curr = curr.parent
+    return list(reversed(path))
+
+
+def _best_first_search(problem, heuristic=None, trace=True, snapshot_every=None, stats=None, open_list=None):
+    # Shared UCS/A* core. heuristic=None gives UCS (h = 0).
+    # With trace=False nothing is yielded until the final result, so callers that
+    # only need the result skip the per-step event building entirely.
+    # With a SearchStats collector the counters are refreshed at every traced event
+    # and the final result carries them under 'stats'.
+    # open_list names one of openlist.OPEN_LISTS to run _open_list_search instead of
+    # this plain heapq-of-Node loop (ties on f in arbitrary order).
+    if open_list:
+        yield from _open_list_search(problem, heuristic, open_list, trace, snapshot_every, stats)
+        return
+    
+    push, pop, successors = heapq.heappush, heapq.heappop, problem.get_successors
+    if stats:
+        push, pop, successors = stats.wrap('push', push), stats.wrap('pop', pop), stats.wrap('successors', successors)
+        if heuristic:
+            heuristic = stats.wrap('heuristic', heuristic)
+    
     start_state = problem.get_start_state()
-    start_node = Node(start_state, cost=0, heuristic=0)
+    start_h = heuristic(start_state) if heuristic else 0
+    start_node = Node(start_state, cost=0, heuristic=start_h)
     
     frontier = []
-    heapq.heappush(frontier, start_node)
+    push(frontier, start_node)
     
     explored = {}
     nodes_expanded = 0
     max_frontier_size = 1
+    steps = 0
     
     while frontier:
         max_frontier_size = max(max_frontier_size, len(frontier))
         
-        yield {
-            'status': 'running',
-            'frontier_size': len(frontier),
-            'expanded': nodes_expanded,
-            'current_node': frontier[0],
-            'explored_set': explored.copy()
-        }
-        
-        node = heapq.heappop(frontier)
+        node = pop(frontier)
         
         if problem.is_goal(node.state):
-            path = []
-            curr = node
-            while curr:
-                path.append(curr.state)
-                curr = curr.parent
-            
-            yield {
+            result = {
                 'status': 'success',
-                'path': list(reversed(path)),
+                'path': _node_path(node),
                 'cost': node.cost,
                 'expanded': nodes_expanded,
                 'max_frontier': max_frontier_size
             }
+            if stats:
+                stats.record(nodes_expanded, len(explored), goal_popped=True)
+                result['stats'] = stats.to_dict()
+            yield result
             return
         
+        steps += 1
+        
         if node.state in explored and explored[node.state] <= node.cost:
+            if trace:
+                if stats:
+                    stats.record(nodes_expanded, len(explored))
+                yield _search_event('stale', node, [], frontier, nodes_expanded, explored, steps, snapshot_every)
             continue
         
         explored[node.state] = node.cost
         nodes_expanded += 1
+        pushed = [] if trace else None
         
-        for next_state, action_cost in problem.get_successors(node.state):
+        for next_state, action_cost in successors(node.state):
             new_cost = node.cost + action_cost
             
             if next_state not in explored or new_cost < explored[next_state]:
-                new_node = Node(next_state, parent=node, cost=new_cost, heuristic=0)
-                heapq.heappush(frontier, new_node)
+                h = heuristic(next_state) if heuristic else 0
+                new_node = Node(next_state, parent=node, cost=new_cost, heuristic=h)
+                push(frontier, new_node)
+                if trace:
+                    pushed.append(next_state)
+        
+        if trace:
+            if stats:
+                stats.record(nodes_expanded, len(explored))
+            yield _search_event('expand', node, pushed, frontier, nodes_expanded, explored, steps, snapshot_every)
     
-    yield {'status': 'failure', 'expanded': nodes_expanded}
+    result = {'status': 'failure', 'expanded': nodes_expanded, 'max_frontier': max_frontier_size}
+    if stats:
+        stats.record(nodes_expanded, len(explored))
+        result['stats'] = stats.to_dict()
+    yield result
 
 
-def astar_search(problem):
+def _open_list_search(problem, heuristic, open_list, trace=True, snapshot_every=None, stats=None):
+    # _best_first_search on an OPEN_LISTS frontier of (f, h, -seq, node) entries: ties on f go
+    # to the lower h (higher g), then to the latest push, so the expansion order is fixed.
+    # A state is only pushed again when it is reached more cheaply than its best copy so far;
+    # the copy that is still open becomes stale, is skipped when popped and counted towards
+    # the open list's compaction.
     start_state = problem.get_start_state()
-    start_h = problem.heuristic(start_state)
-    start_node = Node(start_state, cost=0, heuristic=start_h)
+    start_h = heuristic(start_state) if heuristic else 0
+    best_g = {start_state: 0}  # cost of the latest (cheapest) push of each state
     
-    frontier = []
-    heapq.heappush(frontier, start_node)
+    frontier = OPEN_LISTS[open_list](lambda entry: entry[3].cost == best_g[entry[3].state])
+    push, pop, successors = frontier.push, frontier.pop, problem.get_successors
+    if stats:
+        push, pop, successors = stats.wrap('push', push), stats.wrap('pop', pop), stats.wrap('successors', successors)
+        if heuristic:
+            heuristic = stats.wrap('heuristic', heuristic)
+    superseded = frontier.superseded
     
-    explored = {} 
+    seq = 0
+    push((start_h, start_h, seq, Node(start_state, cost=0, heuristic=start_h)))
+    
+    explored = {}
     nodes_expanded = 0
     max_frontier_size = 1
+    steps = 0
     
     while frontier:
         max_frontier_size = max(max_frontier_size, len(frontier))
         
-        yield {
-            'status': 'running',
-            'frontier_size': len(frontier),
-            'expanded': nodes_expanded,
-            'current_node': frontier[0],
-            'explored_set': explored.copy()
-        }
+        node = pop()[3]
         
-        node = heapq.heappop(frontier)
+        if node.cost > best_g[node.state]:
+            steps += 1
+            if trace:
+                if stats:
+                    stats.record(nodes_expanded, len(explored))
+                top = frontier.peek()[3] if frontier else None
+                yield _search_event('stale', node, [], frontier, nodes_expanded, explored, steps, snapshot_every, top)
+            continue
         
         if problem.is_goal(node.state):
-            path = []
-            curr = node
-            while curr:
-                path.append(curr.state)
-                curr = curr.parent
-            
-            yield {
+            result = {
                 'status': 'success',
-                'path': list(reversed(path)),
+                'path': _node_path(node),
                 'cost': node.cost,
                 'expanded': nodes_expanded,
                 'max_frontier': max_frontier_size
             }
+            if stats:
+                stats.record(nodes_expanded, len(explored), goal_popped=True)
+                result['stats'] = stats.to_dict()
+            yield result
             return
         
-        if node.state in explored and explored[node.state] <= node.cost:
-            continue
-        
+        steps += 1
         explored[node.state] = node.cost
         nodes_expanded += 1
+        pushed = [] if trace else None
         
-        for next_state, action_cost in problem.get_successors(node.state):
+        for next_state, action_cost in successors(node.state):
             new_cost = node.cost + action_cost
+            old_cost = best_g.get(next_state)
             
-            if next_state not in explored or new_cost < explored[next_state]:
-                h = problem.heuristic(next_state)
-                new_node = Node(next_state, parent=node, cost=new_cost, heuristic=h)
-                heapq.heappush(frontier, new_node)
+            if old_cost is None or new_cost < old_cost:
+                # The old copy is still open unless it was the one expanded (a re-opening)
+                if old_cost is not None and explored.get(next_state) != old_cost:
+                    superseded()
+                best_g[next_state] = new_cost
+                h = heuristic(next_state) if heuristic else 0
+                seq -= 1
+                push((new_cost + h, h, seq, Node(next_state, parent=node, cost=new_cost, heuristic=h)))
+                if trace:
+                    pushed.append(next_state)
+        
+        if trace:
+            if stats:
+                stats.record(nodes_expanded, len(explored))
+            top = frontier.peek()[3] if frontier else None
+            yield _search_event('expand', node, pushed, frontier, nodes_expanded, explored, steps, snapshot_every, top)
+    
+    result = {'status': 'failure', 'expanded': nodes_expanded, 'max_frontier': max_frontier_size}
+    if stats:
+        stats.record(nodes_expanded, len(explored))
+        result['stats'] = stats.to_dict()
+    yield result
+
+
+def ucs_search(problem, snapshot_every=None, stats=None, open_list=None):
+    return _best_first_search(problem, None, trace=True, snapshot_every=snapshot_every, stats=stats,
+                              open_list=open_list)
+
+
+def astar_search(problem, snapshot_every=None, stats=None, open_list=None):
+    return _best_first_search(problem, problem.heuristic, trace=True, snapshot_every=snapshot_every, stats=stats,
+                              open_list=open_list)
+
+
+def ucs_solve(problem, stats=None, open_list=None):
+    # Final result only: {'status', 'path', 'cost', 'expanded', 'max_frontier'} (+ 'stats')
+    return next(_best_first_search(problem, None, trace=False, stats=stats, open_list=open_list))
+
+
+def astar_solve(problem, stats=None, open_list=None):
+    return next(_best_first_search(problem, problem.heuristic, trace=False, stats=stats, open_list=open_list))
+
+
+def _anytime_search(problem, epsilon=3.0, epsilon_step=0.5, deadline=None, trace=True, snapshot_every=None):
+    # Anytime Repairing A* (ARA*): weighted A* with f = g + epsilon * h finds a first path
+    # quickly, then epsilon is lowered step by step and each pass reuses the g-values,
+    # frontier and inconsistent states of the previous one instead of restarting.
+    # Every improved path is reported with its suboptimality bound
+    # (cost <= bound * optimal). Stops at bound 1 or once `deadline` seconds have
+    # passed with a path in hand.
+    started = time.perf_counter()
+    deadline_at = started + deadline if deadline is not None else None
+    
+    start_state = problem.get_start_state()
+    goal_state = (problem.goal[0], problem.goal[1], True, True)
+    successors = problem.memoized_successors()  # every pass re-expands the states it reopens
+    h_cache = {}
+    
+    def h(state):
+        value = h_cache.get(state)
+        if value is None:
+            value = h_cache[state] = problem.heuristic(state)
+        return value
+    
+    start_node = Node(start_state, cost=0, heuristic=epsilon * h(start_state))
+    g = {start_state: 0}
+    best_node = {start_state: start_node}
+    frontier = [start_node]
+    closed = set()
+    incons = set()
+    
+    explored = {}
+    solutions = []
+    nodes_expanded = 0
+    max_frontier_size = 1
+    steps = 0
+    bound = float('inf')
+    
+    while True:
+        # ImprovePath: expand until no frontier entry can beat the current goal cost
+        timed_out = False
+        while frontier:
+            goal_cost = g.get(goal_state)
+            top = frontier[0]
+            if goal_cost is not None and goal_cost <= top.cost + top.heuristic:
+                break
+            if goal_cost is not None and deadline_at is not None and time.perf_counter() >= deadline_at:
+                timed_out = True
+                break
+            max_frontier_size = max(max_frontier_size, len(frontier))
+            
+            node = heapq.heappop(frontier)
+            steps += 1
+            
+            if node.state in closed or node.cost > g[node.state]:
+                if trace:
+                    yield _search_event('stale', node, [], frontier, nodes_expanded, explored, steps, snapshot_every)
+                continue
+            
+            closed.add(node.state)
+            explored[node.state] = node.cost
+            nodes_expanded += 1
+            pushed = [] if trace else None
+            
+            for next_state, action_cost in successors(node.state):
+                new_cost = node.cost + action_cost
+                if new_cost < g.get(next_state, new_cost + 1):
+                    g[next_state] = new_cost
+                    new_node = Node(next_state, parent=node, cost=new_cost, heuristic=epsilon * h(next_state))
+                    best_node[next_state] = new_node
+                    if next_state in closed:
+                        incons.add(next_state)
+                    else:
+                        heapq.heappush(frontier, new_node)
+                        if trace:
+                            pushed.append(next_state)
+            
+            if trace:
+                yield _search_event('expand', node, pushed, frontier, nodes_expanded, explored, steps, snapshot_every)
+        
+        if goal_state not in g:
+            yield {'status': 'failure', 'expanded': nodes_expanded, 'max_frontier': max_frontier_size}
+            return
+        
+        # Suboptimality bound: goal cost over the smallest unweighted f among states still open
+        goal_cost = g[goal_state]
+        pending = [node.state for node in frontier if node.state not in closed and node.cost == g[node.state]]
+        lower = min([g[state] + h(state) for state in pending] +
+                    [g[state] + h(state) for state in incons], default=goal_cost)
+        bound = min(epsilon, goal_cost / lower) if lower else 1.0
+        
+        if not solutions or goal_cost < solutions[-1]['cost'] or bound < solutions[-1]['bound']:
+            solutions.append({
+                'cost': goal_cost,
+                'bound': bound,
+                'epsilon': epsilon,
+                'expanded': nodes_expanded,
+                'elapsed': time.perf_counter() - started
+            })
+            if trace:
+                yield {
+                    'status': 'running',
+                    'event': 'solution',
+                    'state': goal_state,
+                    'cost': goal_cost,
+                    'path': _node_path(best_node[goal_state]),
+                    'bound': bound,
+                    'solutions': solutions,
+                    'pushed': [],
+                    'frontier_size': len(frontier),
+                    'expanded': nodes_expanded,
+                    'current_node': frontier[0] if frontier else None
+                }
+        
+        if bound <= 1.0 or timed_out or (deadline_at is not None and time.perf_counter() >= deadline_at):
+            break
+        
+        # Next pass: lower epsilon, move INCONS back to OPEN, re-key OPEN and clear CLOSED
+        epsilon = max(1.0, epsilon - epsilon_step)
+        reopen = set(pending) | incons
+        frontier = []
+        for state in reopen:
+            old = best_node[state]
+            new_node = Node(state, parent=old.parent, cost=g[state], heuristic=epsilon * h(state))
+            best_node[state] = new_node
+            frontier.append(new_node)
+        heapq.heapify(frontier)
+        incons = set()
+        closed = set()
+    
+    yield {
+        'status': 'success',
+        'path': _node_path(best_node[goal_state]),
+        'cost': g[goal_state],
+        'expanded': nodes_expanded,
+        'max_frontier': max_frontier_size,
+        'bound': bound,
+        'solutions': solutions
+    }
+
+
+def anytime_search(problem, epsilon=3.0, epsilon_step=0.5, deadline=None, snapshot_every=None):
+    return _anytime_search(problem, epsilon, epsilon_step, deadline, trace=True, snapshot_every=snapshot_every)
+
+
+def anytime_solve(problem, epsilon=3.0, epsilon_step=0.5, deadline=None):
+    # Final result plus 'bound' and the 'solutions' history: [{'cost', 'bound', 'epsilon', 'expanded', 'elapsed'}, ...]
+    return next(_anytime_search(problem, epsilon, epsilon_step, deadline, trace=False))
+
+
+# Default cap on states held by ida_solve's transposition table
+DEFAULT_NODE_BUDGET = 100000
+DEFAULT_MAX_EXPANSIONS = 10000000
+
+
+def ida_solve(problem, node_budget=DEFAULT_NODE_BUDGET, max_expansions=DEFAULT_MAX_EXPANSIONS):
+    # Memory-bounded search: IDA* with a transposition table of at most node_budget states.
+    # Each iteration is a depth-first search that prunes at f = g + h > threshold. Memory is
+    # the table plus the current path instead of A*'s frontier and explored set.
+    # - The table keeps the cheapest g seen for a state in the current iteration, so duplicate
+    #   paths are cut off. Once it is full the least recently used state (recorded or cutting
+    #   off a path) is evicted for each new one, and the result reports 'degraded': states
+    #   that keep pruning stay, and the rest cost re-expansions.
+    # - After max_expansions expansions the search gives up with a degraded failure, since
+    #   budgets far below the states an iteration visits can still take exponential time.
+    # - Thresholds grow IDA*_CR style: a histogram of the pruned f values picks the next
+    #   threshold so that each iteration roughly doubles the work, instead of creeping up
+    #   by the smallest pruned f (which takes one iteration per distinct path cost).
+    # - Overshooting the optimal cost is fixed by finishing the iteration as branch and bound:
+    #   after a path of cost C is found only f < C is searched, so the final path is optimal.
+    # Extra result keys: 'degraded', 'iterations' and 'peak_nodes' (table plus path).
+    heuristic = problem.heuristic
+    get_successors = problem.get_successors  # not memoized: the memo would outgrow node_budget
+    start_state = problem.get_start_state()
+    threshold = heuristic(start_state)
+    table = {}
+    nodes_expanded = 0
+    iterations = 0
+    max_depth = 1
+    peak_nodes = 1
+    degraded = False
+    best_path = None
+    best_cost = None
+    
+    while True:
+        iterations += 1
+        iteration_expanded = 1
+        table.clear()
+        table[start_state] = 0
+        pruned = {}  # f -> number of successors cut off at that f
+        # Explicit DFS stack of (state, g, successor iterator) instead of recursion,
+        # since paths get longer than Python's recursion limit
+        stack = [(start_state, 0, iter(get_successors(start_state)))]
+        
+        while stack:
+            state, cost, successors = stack[-1]
+            for next_state, action_cost in successors:
+                new_cost = cost + action_cost
+                recorded = table.get(next_state)
+                if recorded is not None and new_cost >= recorded:
+                    if degraded:
+                        # Keep states that keep cutting off duplicate paths
+                        del table[next_state]
+                        table[next_state] = recorded
+                    continue
+                f = new_cost + heuristic(next_state)
+                if f > threshold:
+                    pruned[f] = pruned.get(f, 0) + 1
+                    continue
+                
+                if problem.is_goal(next_state):
+                    # Keep searching below this cost for the rest of the iteration
+                    best_path = [entry[0] for entry in stack] + [next_state]
+                    best_cost = new_cost
+                    threshold = new_cost - 1
+                    continue
+                
+                # Re-inserting moves a state to the back, so the front is the least recently used
+                if table.pop(next_state, None) is None and len(table) >= node_budget:
+                    del table[next(iter(table))]
+                    degraded = True
+                table[next_state] = new_cost
+                stack.append((next_state, new_cost, iter(get_successors(next_state))))
+                iteration_expanded += 1
+                if len(stack) > max_depth:
+                    max_depth = len(stack)
+                if nodes_expanded + iteration_expanded > max_expansions:
+                    return {'status': 'failure', 'expanded': nodes_expanded + iteration_expanded,
+                            'max_frontier': max_depth, 'degraded': True, 'iterations': iterations,
+                            'peak_nodes': max(peak_nodes, len(table) + max_depth)}
+                break
+            else:
+                stack.pop()
+        
+        nodes_expanded += iteration_expanded
+        peak_nodes = max(peak_nodes, len(table) + max_depth)
+        if best_path is not None:
+            return {
+                'status': 'success',
+                'path': best_path,
+                'cost': best_cost,
+                'expanded': nodes_expanded,
+                'max_frontier': max_depth,
+                'degraded': degraded,
+                'iterations': iterations,
+                'peak_nodes': peak_nodes
+            }
+        if not pruned:
+            return {'status': 'failure', 'expanded': nodes_expanded, 'max_frontier': max_depth,
+                    'degraded': degraded, 'iterations': iterations, 'peak_nodes': peak_nodes}
+        
+        # Next threshold: admit about as many cut-off successors as this iteration expanded
+        admitted = 0
+        for f in sorted(pruned):
+            admitted += pruned[f]
+            threshold = f
+            if admitted >= iteration_expanded:
+                break
+
+
+INF_COST = 2 ** 31 - 1
+
+
+def _compact_search(problem, heuristic=None, stats=None, open_list=None):
+    # Same search as _best_first_search over packed integer states: g-costs and parents
+    # live in flat arrays of 4 * W * H entries and the heap holds plain (f, h, index) tuples.
+    # heuristic (if given) takes a packed index, see PirateProblem.make_index_heuristic.
+    # Successors come straight from the problem's compiled CSR neighbor tables, so
+    # SearchStats reports no successor calls and, without a closed set, no re-openings.
+    # open_list swaps the heap for one of openlist.OPEN_LISTS (same order, with compaction).
+    num_states = 4 * problem.width * problem.height
+    g = array('i', [INF_COST]) * num_states
+    
+    superseded = None
+    if open_list:
+        frontier = OPEN_LISTS[open_list](lambda entry: entry[0] - entry[1] == g[entry[2]])
+        push, pop, superseded = frontier.push, frontier.pop, frontier.superseded
+    else:
+        frontier = []
+        push, pop = functools.partial(heapq.heappush, frontier), functools.partial(heapq.heappop, frontier)
+    if stats:
+        push, pop = stats.wrap('push', push), stats.wrap('pop', pop)
+        if heuristic:
+            heuristic = stats.wrap('heuristic', heuristic)
+    
+    offsets = problem.neighbor_offsets
+    ends = problem.neighbor_ends
+    neighbor_cells = problem.neighbor_cells
+    neighbor_costs = problem.neighbor_costs
+    key_cell = problem.key_cell
+    chest_cell = problem.chest_cell
+    goal_cell = problem.goal_cell
+    
+    parent = array('i', [-1]) * num_states
+    
+    start = problem.encode_state(problem.get_start_state())
+    start_h = heuristic(start) if heuristic else 0
+    g[start] = 0
+    push((start_h, start_h, start))
+    nodes_expanded = 0
+    max_frontier_size = 1
+    
+    while frontier:
+        if len(frontier) > max_frontier_size:
+            max_frontier_size = len(frontier)
+        
+        f, h, index = pop()
+        cost = f - h
+        
+        # Stale entry: a cheaper copy of this state was pushed later
+        if cost > g[index]:
+            continue
+        
+        cell = index >> 2
+        if index & 1 and cell == goal_cell:
+            path = []
+            while index != -1:
+                path.append(problem.decode_state(index))
+                index = parent[index]
+            result = {
+                'status': 'success',
+                'path': list(reversed(path)),
+                'cost': cost,
+                'expanded': nodes_expanded,
+                'max_frontier': max_frontier_size
+            }
+            if stats:
+                stats.record(nodes_expanded, goal_popped=True)
+                result['stats'] = stats.to_dict()
+            return result
+        
+        nodes_expanded += 1
+        flags = index & 3
+        
+        for k in range(offsets[cell], ends[cell]):
+            ncell = neighbor_cells[k]
+            
+            new_flags = flags
+            if ncell == key_cell:
+                new_flags |= 2
+            if ncell == chest_cell and new_flags & 2:
+                new_flags |= 1
+            
+            next_index = (ncell << 2) | new_flags
+            new_cost = cost + neighbor_costs[k]
+            if new_cost < g[next_index]:
+                if superseded and g[next_index] != INF_COST:
+                    superseded()
+                g[next_index] = new_cost
+                parent[next_index] = index
+                nh = heuristic(next_index) if heuristic else 0
+                push((new_cost + nh, nh, next_index))
+    
+    result = {'status': 'failure', 'expanded': nodes_expanded, 'max_frontier': max_frontier_size}
+    if stats:
+        stats.record(nodes_expanded)
+        result['stats'] = stats.to_dict()
+    return result
+
+
+def ucs_compact_solve(problem, stats=None, open_list=None):
+    return _compact_search(problem, None, stats, open_list)
+
+
+def astar_compact_solve(problem, stats=None, open_list=None):
+    return _compact_search(problem, problem.make_index_heuristic(), stats, open_list)
+
+
+def _cell_search(problem, source_cell, target_cell):
+    # Plain 2D A* over grid cells (no inventory flags) with a Manhattan estimate,
+    # which is admissible because every move costs at least 1.
+    # Returns (cost, cells, expanded, max_frontier), or None if target_cell is unreachable.
+    width = problem.width
+    offsets = problem.neighbor_offsets
+    ends = problem.neighbor_ends
+    neighbor_cells = problem.neighbor_cells
+    neighbor_costs = problem.neighbor_costs
+    ty, tx = divmod(target_cell, width)
+    
+    g = array('i', [INF_COST]) * (width * problem.height)
+    parent = array('i', [-1]) * (width * problem.height)
+    
+    sy, sx = divmod(source_cell, width)
+    start_h = abs(sx - tx) + abs(sy - ty)
+    g[source_cell] = 0
+    frontier = [(start_h, start_h, source_cell)]
+    nodes_expanded = 0
+    max_frontier_size = 1
+    
+    while frontier:
+        if len(frontier) > max_frontier_size:
+            max_frontier_size = len(frontier)
+        
+        f, h, cell = heapq.heappop(frontier)
+        cost = f - h
+        if cost > g[cell]:
+            continue
+        
+        if cell == target_cell:
+            cells = []
+            while cell != -1:
+                cells.append(cell)
+                cell = parent[cell]
+            cells.reverse()
+            return cost, cells, nodes_expanded, max_frontier_size
+        
+        nodes_expanded += 1
+        for k in range(offsets[cell], ends[cell]):
+            ncell = neighbor_cells[k]
+            new_cost = cost + neighbor_costs[k]
+            if new_cost < g[ncell]:
+                g[ncell] = new_cost
+                parent[ncell] = cell
+                ny, nx = divmod(ncell, width)
+                nh = abs(nx - tx) + abs(ny - ty)
+                heapq.heappush(frontier, (new_cost + nh, nh, ncell))
+    
+    return None
+
+
+def field_solve(problem):
+    # Answers from the problem's cached cost-to-go field (PirateProblem.cost_to_go): the first
+    # query on a map layout pays for the backward search, later starts only follow the field.
+    # 'expanded' counts the states the field settled when it was built.
+    field = problem.cost_to_go()
+    start_state = problem.get_start_state()
+    path = field.path(start_state)
+    if path is None:
+        return {'status': 'failure', 'expanded': field.settled, 'max_frontier': 0}
+    return {
+        'status': 'success',
+        'path': path,
+        'cost': field.cost(start_state),
+        'expanded': field.settled,
+        'max_frontier': 0
+    }
+
+
+def cells_to_states(problem, cells):
+    # Replay the inventory rules of get_successors along a cell path starting at the ship
+    path = [problem.get_start_state()]
+    has_key, has_treasure = False, False
+    for cell in cells[1:]:
+        has_key = has_key or cell == problem.key_cell
+        has_treasure = has_treasure or (cell == problem.chest_cell and has_key)
+        y, x = divmod(cell, problem.width)
+        path.append((x, y, has_key, has_treasure))
+    return path
+
+
+def key_round_trip(problem):
+    # First leg when the ship starts on the key: the key flag is only set by entering the key
+    # cell, so the cheapest way to pick it up is one step onto the cheapest passable neighbor
+    # and straight back. Returns (cost, cells), or None if the key cell cannot be re-entered.
+    cell = problem.key_cell
+    best = None
+    for k in range(problem.neighbor_offsets[cell], problem.neighbor_ends[cell]):
+        cost = problem.neighbor_costs[k] + problem.cell_costs[cell]
+        if best is None or cost < best[0]:
+            best = (cost, [cell, problem.neighbor_cells[k], cell])
+    return best
+
+
+def waypoint_solve(problem):
+    # Plans start -> key, key -> chest and chest -> goal as three 2D searches and stitches them.
+    # Inventory only changes on the first visit to the key and on reaching the chest while
+    # holding it, so the optimal 4D cost is exactly the sum of the three leg costs.
+    # Flags along the stitched path are replayed with the same rules as get_successors,
+    # so a leg that crosses the key or chest early still yields the right states.
+    # A ship starting on the key still has to step off and back to pick it up (key_round_trip).
+    width = problem.width
+    waypoints = [problem.start[1] * width + problem.start[0],
+                 problem.key_cell, problem.chest_cell, problem.goal_cell]
+    
+    total_cost = 0
+    nodes_expanded = 0
+    max_frontier_size = 0
+    cells = [waypoints[0]]
+    for leg_index, (source_cell, target_cell) in enumerate(zip(waypoints, waypoints[1:])):
+        if leg_index == 0 and source_cell == target_cell:
+            trip = key_round_trip(problem)
+            leg = trip and (trip[0], trip[1], 0, 0)
+        else:
+            leg = _cell_search(problem, source_cell, target_cell)
+        if leg is None:
+            return {'status': 'failure', 'expanded': nodes_expanded, 'max_frontier': max_frontier_size}
+        leg_cost, leg_cells, leg_expanded, leg_frontier = leg
+        total_cost += leg_cost
+        nodes_expanded += leg_expanded
+        max_frontier_size = max(max_frontier_size, leg_frontier)
+        cells.extend(leg_cells[1:])
     
-    yield {'status': 'failure', 'expanded': nodes_expanded}
+    return {
+        'status': 'success',
+        'path': cells_to_states(problem, cells),
+        'cost': total_cost,
+        'expanded': nodes_expanded,
+        'max_frontier': max_frontier_size
+    }
@@ -0,0 +1,291 @@
+import argparse
+import concurrent.futures
+import csv
+import os
+import sys
+import time
+from array import array
+from collections import OrderedDict
+from multiprocessing import shared_memory
+
+from benchmark import ALGORITHMS
+from mapfile import CODE_OF, MappedGrid, load_scenario, open_map
+from problem import PirateProblem, HEURISTIC_MODES, COMPILED_TABLES, forget_cost_to_go
+
+# Chunks kept in flight per worker, so large task iterables are consumed lazily
+CHUNKS_PER_WORKER = 4
+
+# Shared maps a worker keeps attached; the least recently used one is detached past this
+ATTACHED_MAPS = 4
+
+BATCH_FIELDS = ['task', 'status', 'cost', 'expanded', 'max_frontier', 'path_len', 'time_s', 'worker']
+
+# Per-process worker state: the shared cancel flag and problems built on attached maps
+_cancel_flag = None
+_attached = OrderedDict()
+
+
+def _init_worker(control_name):
+    global _cancel_flag
+    _cancel_flag = shared_memory.SharedMemory(name=control_name)
+
+
+def _block_layout(cells, slots):
+    # Shared map block: the compiled tables, int tables first so every section stays aligned
+    # for its typecode, then the terrain codes. ([(name, typecode, offset, count)], codes offset)
+    counts = {'cell_costs': cells, 'neighbor_offsets': cells + 1, 'neighbor_ends': cells,
+              'neighbor_cells': slots, 'neighbor_costs': slots}
+    layout = []
+    offset = 0
+    for name, typecode in sorted(COMPILED_TABLES, key=lambda table: table[1] != 'i'):
+        layout.append((name, typecode, offset, counts[name]))
+        offset += counts[name] * array(typecode).itemsize
+    return layout, offset
+
+
+def _worker_problem(source, heuristic_mode):
+    # Problem for a chunk's map. A shared map (block name, width, height, slots) is attached
+    # once per worker: the problem reads the parent's compiled tables in place, and later
+    # queries only swap the waypoints. Any other map (a grid or a map file path) is compiled here.
+    origin = (0, 0)
+    if not isinstance(source, tuple):
+        grid = open_map(source) if isinstance(source, str) else source
+        return PirateProblem(grid, origin, origin, origin, origin, heuristic_mode=heuristic_mode)
+    map_name, width, height, slots = source
+    if map_name in _attached:
+        _attached.move_to_end(map_name)
+    else:
+        if len(_attached) >= ATTACHED_MAPS:
+            _detach(next(iter(_attached)))
+        block = shared_memory.SharedMemory(name=map_name)
+        layout, codes_offset = _block_layout(width * height, slots)
+        views = {name: block.buf[offset:offset + count * array(typecode).itemsize].cast(typecode)
+                 for name, typecode, offset, count in layout}
+        grid = MappedGrid(block.buf[codes_offset:codes_offset + width * height], width, height)
+        _attached[map_name] = (block, PirateProblem(grid, origin, origin, origin, origin,
+                                                    heuristic_mode=heuristic_mode,
+                                                    tables=[views[name] for name, _ in COMPILED_TABLES]))
+    return _attached[map_name][1]
+
+
+def _detach(map_name):
+    # The block can only be unmapped once nothing reads its tables: cached cost-to-go
+    # fields still hold this map's cell_costs view
+    block, problem = _attached.pop(map_name)
+    forget_cost_to_go(problem.cell_costs)
+    del problem
+    block.close()
+
+
+def _solve_chunk(algo_name, heuristic_mode, include_paths, source, queries):
+    solve = ALGORITHMS[algo_name]
+    base = _worker_problem(source, heuristic_mode)
+    results = []
+    for task, start, key, chest, goal in queries:
+        if _cancel_flag.buf[0]:
+            break
+        problem = base.with_waypoints(start, key, chest, goal)
+        t0 = time.perf_counter()
+        result = solve(problem)
+        elapsed = time.perf_counter() - t0
+        success = result['status'] == 'success'
+        row = {
+            'task': task,
+            'status': result['status'],
+            'cost': result['cost'] if success else None,
+            'expanded': result['expanded'],
+            'max_frontier': result.get('max_frontier'),
+            'path_len': len(result['path']) if success else None,
+            'time_s': elapsed,
+            'worker': os.getpid(),
+        }
+        if include_paths and success:
+            row['path'] = result['path']
+        results.append(row)
+    return results
+
+
+class BatchSolver:
+    # Solves many independent pirate problems on a process pool.
+    # Tasks are (grid, start, key, chest, goal) tuples as returned by generate_map/load_map,
+    # or scenario query dicts (mapfile.load_scenario). Consecutive tasks on the same map are
+    # grouped into chunks of up to chunk_size per submission.
+    # A map whose queries fill more than one chunk is compiled once here and its tables and
+    # terrain codes are copied into a shared memory block that workers attach to, so those
+    # chunks only carry the block name and the waypoints. The block is freed as soon as its
+    # last chunk completes. A map with a single chunk is sent as is and compiled by the worker,
+    # so streams of distinct maps compile in parallel instead of one by one in this process.
+    def __init__(self, algorithm='astar-compact', workers=None, chunk_size=16,
+                 heuristic_mode='manhattan', include_paths=False):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self.workers = workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.heuristic_mode = heuristic_mode
+        self.include_paths = include_paths
+        self._control = shared_memory.SharedMemory(create=True, size=1)
+        self._control.buf[0] = 0
+        self._blocks = {}
+        self._block_users = {}  # map key -> chunks in flight or being built on the shared block
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            self.workers, initializer=_init_worker, initargs=(self._control.name,))
+    
+    def _share(self, key, grid):
+        # (block name, width, height, neighbor slots) of a map, shared on first use
+        if key not in self._blocks:
+            if isinstance(key, str):
+                grid = open_map(key)
+            origin = (0, 0)
+            problem = PirateProblem(grid, origin, origin, origin, origin)
+            if isinstance(grid, MappedGrid):
+                codes = bytes(grid.buffer)
+            else:
+                codes = bytes(CODE_OF[terrain] for row in grid for terrain in row)
+            slots = len(problem.neighbor_cells)
+            layout, codes_offset = _block_layout(len(codes), slots)
+            block = shared_memory.SharedMemory(create=True, size=codes_offset + max(1, len(codes)))
+            for name, _, offset, _ in layout:
+                table = getattr(problem, name).tobytes()
+                block.buf[offset:offset + len(table)] = table
+            block.buf[codes_offset:codes_offset + len(codes)] = codes
+            self._blocks[key] = (block, grid, slots)
+        block, grid, slots = self._blocks[key]
+        return block.name, len(grid[0]), len(grid), slots
+    
+    def _acquire(self, key):
+        self._block_users[key] = self._block_users.get(key, 0) + 1
+    
+    def _release(self, key):
+        # Free a shared block once no chunk in flight or being built uses it
+        self._block_users[key] -= 1
+        if not self._block_users[key]:
+            del self._block_users[key]
+            block, _, _ = self._blocks.pop(key)
+            block.close()
+            block.unlink()
+    
+    def _chunk_source(self, key, grid, shared):
+        # What a chunk's worker builds its problem from: the shared block, or the map itself
+        if shared or key in self._blocks:
+            return self._share(key, grid)
+        if isinstance(grid, MappedGrid):
+            # Usually backed by an mmap, which does not pickle
+            return MappedGrid(bytes(grid.buffer), grid.width, grid.height)
+        return grid
+    
+    def _chunks(self, tasks):
+        # (map key or None when not shared, source, [(task index, start, key, chest, goal), ...])
+        chunk, chunk_key, chunk_grid = [], None, None
+        held = False  # the current run of one map holds its shared block for the chunk being built
+        for task, item in enumerate(tasks):
+            if isinstance(item, dict):
+                # Map files are opened from their path, by whoever compiles them
+                map_key = grid = item['map']
+                waypoints = (item['start'], item['key'], item['chest'], item['goal'])
+            else:
+                grid, *waypoints = item
+                # Keyed by identity: the previous grid is still referenced here, and a shared
+                # grid stays referenced in _blocks, so a live key is never reused
+                map_key = id(grid)
+            if chunk and (map_key != chunk_key or len(chunk) >= self.chunk_size):
+                # Share the map when its queries go on past this chunk
+                run_continues = map_key == chunk_key
+                source = self._chunk_source(chunk_key, chunk_grid, run_continues)
+                if run_continues and not held:
+                    self._acquire(chunk_key)
+                    held = True
+                yield (chunk_key if isinstance(source, tuple) else None), source, chunk
+                if held and not run_continues:
+                    self._release(chunk_key)
+                    held = False
+                chunk = []
+            chunk_key, chunk_grid = map_key, grid
+            chunk.append((task, *waypoints))
+        if chunk:
+            source = self._chunk_source(chunk_key, chunk_grid, False)
+            yield (chunk_key if isinstance(source, tuple) else None), source, chunk
+            if held:
+                self._release(chunk_key)
+    
+    def solve(self, tasks):
+        # Yields one stats dict per task in completion order (not task order)
+        chunks = self._chunks(tasks)
+        pending = {}  # future -> shared map key or None
+        try:
+            while True:
+                while len(pending) < self.workers * CHUNKS_PER_WORKER and not self._control.buf[0]:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    map_key, source, queries = chunk
+                    if map_key is not None:
+                        self._acquire(map_key)
+                    pending[self._executor.submit(_solve_chunk, self.algorithm, self.heuristic_mode,
+                                                  self.include_paths, source, queries)] = map_key
+                if not pending:
+                    return
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    map_key = pending.pop(future)
+                    if map_key is not None:
+                        self._release(map_key)
+                    if not future.cancelled():
+                        yield from future.result()
+        finally:
+            # Abandoned or cancelled runs drop whatever has not started yet; close() frees the rest
+            for future, map_key in pending.items():
+                if future.cancel() and map_key is not None:
+                    self._release(map_key)
+    
+    def cancel(self):
+        # Stop handing out tasks; running chunks stop after their current task
+        self._control.buf[0] = 1
+    
+    def close(self):
+        self.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for block, _, _ in self._blocks.values():
+            block.close()
+            block.unlink()
+        self._blocks.clear()
+        self._block_users.clear()
+        self._control.close()
+        self._control.unlink()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def solve_batch(tasks, algorithm='astar-compact', workers=None, chunk_size=16, heuristic_mode='manhattan'):
+    # Convenience wrapper: all stats dicts, in completion order
+    with BatchSolver(algorithm, workers, chunk_size, heuristic_mode) as solver:
+        return list(solver.solve(tasks))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve every query of a scenario file on a process pool")
+    parser.add_argument('scenario', help='scenario file or MovingAI .scen')
+    parser.add_argument('--algorithm', choices=list(ALGORITHMS), default='astar-compact')
+    parser.add_argument('--heuristic', choices=HEURISTIC_MODES, default='manhattan')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--chunk-size', type=int, default=16, help='queries per submitted task')
+    args = parser.parse_args(argv)
+    
+    queries = load_scenario(args.scenario)
+    writer = csv.DictWriter(sys.stdout, fieldnames=BATCH_FIELDS)
+    writer.writeheader()
+    t0 = time.perf_counter()
+    with BatchSolver(args.algorithm, args.workers, args.chunk_size, args.heuristic) as solver:
+        for row in solver.solve(queries):
+            writer.writerow(row)
+    elapsed = time.perf_counter() - t0
+    print(f"{len(queries)} queries in {elapsed:.2f}s ({len(queries) / elapsed:.1f}/s, "
+          f"{solver.workers} workers)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+import argparse
+import csv
+import functools
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from algorithms import (ucs_search, astar_search, ucs_solve, astar_solve, ucs_compact_solve,
+                        astar_compact_solve, waypoint_solve, anytime_solve, ida_solve, field_solve,
+                        SearchStats, DEFAULT_NODE_BUDGET, DEFAULT_MAX_EXPANSIONS)
+from hierarchy import hpa_solve
+from incremental import IncrementalPlanner
+from mapfile import load_map, load_scenario, open_map
+from problem import PirateProblem, generate_map, HEURISTIC_MODES, TERRAIN_COSTS
+
+RUN_FIELDS = ['algorithm', 'heuristic', 'map', 'query', 'seed', 'edit', 'width', 'height', 'status',
+              'time_s', 'expanded', 'max_frontier', 'peak_mem_kb', 'cost', 'path_len', 'suboptimality',
+              'recorded_cost', 'degraded']
+METRICS = ['time_s', 'expanded', 'max_frontier', 'peak_mem_kb', 'cost', 'suboptimality']
+# Extra columns filled in by --stats (see SearchStats.to_dict); --timers adds time_<phase>_s
+STATS_FIELDS = ['pushes', 'pops', 'stale_pops', 'reopenings', 'heuristic_evals', 'successor_calls']
+TIMER_FIELDS = [f'time_{phase}_s' for phase in SearchStats.PHASES]
+
+
+def parse_seeds(text):
+    # Accepts "7", "0-99" (inclusive) or "1,5,9"
+    seeds = []
+    for part in text.split(','):
+        if '-' in part:
+            lo, hi = part.split('-', 1)
+            seeds.extend(range(int(lo), int(hi) + 1))
+        else:
+            seeds.append(int(part))
+    return seeds
+
+
+def run_to_completion(search_gen):
+    # Drain a search generator and return its final (non-'running') result
+    result = None
+    for result in search_gen:
+        if result['status'] != 'running':
+            break
+    return result
+
+
+def _drained(search_fn):
+    return lambda problem, **options: run_to_completion(search_fn(problem, **options))
+
+
+# Every entry maps a problem to the final result dict
+ALGORITHMS = {
+    'ucs': _drained(ucs_search),
+    'astar': _drained(astar_search),
+    'ucs-solve': ucs_solve,
+    'astar-solve': astar_solve,
+    'ucs-compact': ucs_compact_solve,
+    'astar-compact': astar_compact_solve,
+    'ucs-solve-heap': functools.partial(ucs_solve, open_list='heap'),
+    'astar-solve-heap': functools.partial(astar_solve, open_list='heap'),
+    'ucs-solve-bucket': functools.partial(ucs_solve, open_list='bucket'),
+    'astar-solve-bucket': functools.partial(astar_solve, open_list='bucket'),
+    'ucs-compact-bucket': functools.partial(ucs_compact_solve, open_list='bucket'),
+    'astar-compact-bucket': functools.partial(astar_compact_solve, open_list='bucket'),
+    'waypoint': waypoint_solve,
+    'hpa': hpa_solve,
+    'anytime': anytime_solve,
+    'ida': ida_solve,
+    'field': field_solve,
+}
+
+# Algorithms that accept a SearchStats collector (stats=...)
+INSTRUMENTED = {'ucs', 'astar', 'ucs-solve', 'astar-solve', 'ucs-compact', 'astar-compact',
+                'ucs-solve-heap', 'astar-solve-heap', 'ucs-solve-bucket', 'astar-solve-bucket',
+                'ucs-compact-bucket', 'astar-compact-bucket'}
+
+# Algorithms that trade optimality for speed: excluded from --check and reported
+# with suboptimality = cost / optimal cost (optimal from astar_compact_solve)
+APPROXIMATE = {'hpa'}
+
+
+def _run_row(algo_name, heuristic_mode, seed, edit, width, height, result, elapsed, peak_kb):
+    success = result['status'] == 'success'
+    return {
+        'algorithm': algo_name,
+        'heuristic': heuristic_mode,
+        'map': None,
+        'query': None,
+        'seed': seed,
+        'edit': edit,
+        'width': width,
+        'height': height,
+        'status': result['status'],
+        'time_s': elapsed,
+        'expanded': result['expanded'],
+        'max_frontier': result.get('max_frontier'),
+        'peak_mem_kb': peak_kb,
+        'cost': result['cost'] if success else None,
+        'path_len': len(result['path']) if success else None,
+        'suboptimality': None,
+        'recorded_cost': None,
+        'degraded': result.get('degraded'),
+    }
+
+
+def benchmark_run(algo_name, seed, width, height, measure_memory=True, heuristic_mode='manhattan',
+                  collect_stats=False, timers=False, registry=ALGORITHMS):
+    grid, start, key, chest, goal = generate_map(width, height, seed=seed)
+    problem = PirateProblem(grid, start, key, chest, goal, heuristic_mode=heuristic_mode)
+    return benchmark_problem(algo_name, problem, seed, measure_memory, heuristic_mode, collect_stats, timers,
+                             registry)
+
+
+def benchmark_problem(algo_name, problem, seed=None, measure_memory=True, heuristic_mode='manhattan',
+                      collect_stats=False, timers=False, registry=ALGORITHMS):
+    # registry maps algo_name to its solver (ALGORITHMS, or a copy with different options)
+    solve = registry[algo_name]
+    
+    t0 = time.perf_counter()
+    result = solve(problem)
+    elapsed = time.perf_counter() - t0
+    
+    # Memory is measured on a separate run so tracemalloc overhead does not skew timing
+    peak_kb = None
+    if measure_memory:
+        tracemalloc.start()
+        solve(problem)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_kb = peak / 1024
+    
+    row = _run_row(algo_name, heuristic_mode, seed, None, problem.width, problem.height, result, elapsed, peak_kb)
+    
+    # Counters come from one more instrumented run, so wrappers and timers do not skew time_s
+    if collect_stats and algo_name in INSTRUMENTED:
+        stats = SearchStats(timers=timers)
+        solve(problem, stats=stats)
+        row.update((field, value) for field, value in stats.to_dict().items()
+                   if field in STATS_FIELDS + TIMER_FIELDS)
+    
+    if algo_name in APPROXIMATE and result['status'] == 'success':
+        row['suboptimality'] = result['cost'] / astar_compact_solve(problem)['cost']
+    return row
+
+
+def benchmark_scenario(algo_names, queries, measure_memory=True, heuristic_mode='manhattan',
+                       collect_stats=False, timers=False, registry=ALGORITHMS):
+    # Every query of a scenario file through every algorithm; each map file is opened once
+    runs = []
+    grids = {}
+    for number, query in enumerate(queries):
+        if query['map'] not in grids:
+            grids[query['map']] = open_map(query['map'])
+        problem = PirateProblem(grids[query['map']], query['start'], query['key'], query['chest'],
+                                query['goal'], heuristic_mode=heuristic_mode)
+        for algo_name in algo_names:
+            row = benchmark_problem(algo_name, problem, None, measure_memory, heuristic_mode,
+                                    collect_stats, timers, registry)
+            row['map'] = query['map']
+            row['query'] = number
+            row['recorded_cost'] = query['cost']
+            runs.append(row)
+    return runs
+
+
+def benchmark_replanning(seed, width, height, num_edits):
+    # Random single-tile edits on one map: repair with IncrementalPlanner vs rerun astar_solve
+    grid, start, key, chest, goal = generate_map(width, height, seed=seed)
+    problem = PirateProblem(grid, start, key, chest, goal)
+    planner = IncrementalPlanner(problem)
+    planner.plan()
+    
+    rng = random.Random(seed)
+    waypoints = {start, key, chest, goal}
+    runs = []
+    for edit in range(num_edits):
+        pos = (rng.randrange(width), rng.randrange(height))
+        while pos in waypoints:
+            pos = (rng.randrange(width), rng.randrange(height))
+        terrain = rng.choice(list(TERRAIN_COSTS))
+        
+        t0 = time.perf_counter()
+        planner.set_terrain(pos, terrain)
+        result = planner.plan()
+        elapsed = time.perf_counter() - t0
+        runs.append(_run_row('incremental', 'manhattan', seed, edit, width, height, result, elapsed, None))
+        
+        t0 = time.perf_counter()
+        result = astar_solve(problem)
+        elapsed = time.perf_counter() - t0
+        runs.append(_run_row('astar-rerun', 'manhattan', seed, edit, width, height, result, elapsed, None))
+    return runs
+
+
+def check_costs(runs):
+    # Every algorithm here is optimal, so all runs on the same problem (map file and query,
+    # or seed and edit) must agree on cost
+    mismatches = []
+    for instance in dict.fromkeys(_instance(run) for run in runs):
+        costs = {run['algorithm']: run['cost'] for run in runs
+                 if _instance(run) == instance and run['algorithm'] not in APPROXIMATE}
+        # Optimal costs stored in a scenario file take part like another exact algorithm
+        costs.update({'recorded': run['recorded_cost'] for run in runs
+                      if _instance(run) == instance and run['recorded_cost'] is not None})
+        if len(set(costs.values())) > 1:
+            mismatches.append((instance, costs))
+    return mismatches
+
+
+def _instance(run):
+    return run['map'], run['query'], run['seed'], run['edit']
+
+
+def summarize(runs):
+    summary = []
+    for algo_name in dict.fromkeys(run['algorithm'] for run in runs):
+        algo_runs = [run for run in runs if run['algorithm'] == algo_name]
+        row = {'algorithm': algo_name, 'runs': len(algo_runs),
+               'solved': sum(1 for run in algo_runs if run['status'] == 'success')}
+        for metric in METRICS + STATS_FIELDS + TIMER_FIELDS:
+            values = [run[metric] for run in algo_runs if run.get(metric) is not None]
+            if not values:
+                continue
+            row[metric + '_mean'] = statistics.mean(values)
+            row[metric + '_median'] = statistics.median(values)
+            row[metric + '_min'] = min(values)
+            row[metric + '_max'] = max(values)
+            row[metric + '_total'] = sum(values)
+        summary.append(row)
+    return summary
+
+
+def write_csv(out, runs, summary):
+    fields = RUN_FIELDS + [field for field in STATS_FIELDS + TIMER_FIELDS if any(field in run for run in runs)]
+    writer = csv.DictWriter(out, fieldnames=fields)
+    writer.writeheader()
+    writer.writerows(runs)
+    
+    # Aggregates follow as a second table, separated by a blank line
+    out.write('\n')
+    fields = list(dict.fromkeys(field for row in summary for field in row))
+    writer = csv.DictWriter(out, fieldnames=fields)
+    writer.writeheader()
+    writer.writerows(summary)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless UCS vs A* benchmark over seeded maps")
+    parser.add_argument('--seeds', default='0-9', help='seed list, e.g. "0-99" or "1,5,9"')
+    parser.add_argument('--width', type=int, default=17)
+    parser.add_argument('--height', type=int, default=17)
+    parser.add_argument('--algorithms', nargs='+', default=['ucs', 'astar'], choices=list(ALGORITHMS))
+    parser.add_argument('--heuristic', choices=HEURISTIC_MODES, default='manhattan')
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+    parser.add_argument('--output', help='output file (default: stdout)')
+    parser.add_argument('--check', action='store_true',
+                        help='exit with an error if the exact algorithms disagree on optimal cost for any seed')
+    parser.add_argument('--replan-edits', type=int, default=0,
+                        help='instead of --algorithms, apply N random tile edits per map and compare '
+                             'incremental replanning with rerunning A*')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc peak memory run')
+    parser.add_argument('--stats', action='store_true',
+                        help='add search counters (pushes, pops, stale pops, ...) from an extra instrumented run')
+    parser.add_argument('--timers', action='store_true', help='with --stats, also time each search phase')
+    parser.add_argument('--node-budget', type=int, default=DEFAULT_NODE_BUDGET,
+                        help='state budget of the memory-bounded ida search')
+    parser.add_argument('--max-expansions', type=int, default=DEFAULT_MAX_EXPANSIONS,
+                        help='expansions after which the ida search gives up (degraded failure)')
+    parser.add_argument('--map', help='run on a saved .pmap map file instead of generated maps')
+    parser.add_argument('--scenario', help='run every query of a scenario file (or MovingAI .scen) '
+                                           'instead of generated maps')
+    args = parser.parse_args(argv)
+    # A local copy: batch.py and the tests share the module-level registry
+    registry = dict(ALGORITHMS, ida=functools.partial(ida_solve, node_budget=args.node_budget,
+                                                      max_expansions=args.max_expansions))
+    
+    runs = []
+    if args.map:
+        grid, start, key, chest, goal = load_map(args.map)
+        problem = PirateProblem(grid, start, key, chest, goal, heuristic_mode=args.heuristic)
+        for algo_name in args.algorithms:
+            runs.append(benchmark_problem(algo_name, problem, None, not args.no_memory, args.heuristic,
+                                          args.stats, args.timers, registry))
+            runs[-1]['map'] = args.map
+    elif args.scenario:
+        runs = benchmark_scenario(args.algorithms, load_scenario(args.scenario),
+                                  not args.no_memory, args.heuristic, args.stats, args.timers, registry)
+    seeds = [] if args.map or args.scenario else parse_seeds(args.seeds)
+    for seed in seeds:
+        if args.replan_edits:
+            runs.extend(benchmark_replanning(seed, args.width, args.height, args.replan_edits))
+            continue
+        for algo_name in args.algorithms:
+            runs.append(benchmark_run(algo_name, seed, args.width, args.height,
+                                      measure_memory=not args.no_memory,
+                                      heuristic_mode=args.heuristic,
+                                      collect_stats=args.stats, timers=args.timers,
+                                      registry=registry))
+    summary = summarize(runs)
+    mismatches = check_costs(runs) if args.check else []
+    
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        if args.format == 'json':
+            json.dump({'runs': runs, 'summary': summary}, out, indent=2)
+            out.write('\n')
+        else:
+            write_csv(out, runs, summary)
+    finally:
+        if args.output:
+            out.close()
+    
+    for (map_path, query, seed, edit), costs in mismatches:
+        where = f"{map_path} query {query}" if map_path else f"seed {seed} (edit {edit})"
+        print(f"Cost mismatch on {where}: {costs}", file=sys.stderr)
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,9 @@
+import heapq
+from array import array
+
+UNREACHABLE = 2 ** 31 - 1
+
+
 def manhattan_distance(pos1, pos2):
     return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
 
@@ -23,3 +29,193 @@ def pirate_heuristic(state, key_pos, chest_pos, goal):
         return manhattan_distance((x, y), goal)
     
     return 0
+
+
+def pirate_index_heuristic(width, key_pos, chest_pos, goal):
+    # pirate_heuristic over packed state indices, with the constant legs precomputed
+    kx, ky = key_pos
+    cx, cy = chest_pos
+    gx, gy = goal
+    chest_to_goal = manhattan_distance(chest_pos, goal)
+    key_to_goal = manhattan_distance(key_pos, chest_pos) + chest_to_goal
+    
+    def h(index):
+        y, x = divmod(index >> 2, width)
+        if index & 1:
+            return abs(x - gx) + abs(y - gy)
+        if index & 2:
+            return abs(x - cx) + abs(y - cy) + chest_to_goal
+        return abs(x - kx) + abs(y - ky) + key_to_goal
+    
+    return h
+
+
+def backward_distance_field(problem, target_cell):
+    # Dijkstra from target_cell over the compiled grid with edges reversed:
+    # field[c] is the cheapest cost of walking from cell c to target_cell
+    # (each step pays the cost of the cell it enters), UNREACHABLE if cut off.
+    offsets = problem.neighbor_offsets
+    ends = problem.neighbor_ends
+    neighbor_cells = problem.neighbor_cells
+    cell_costs = problem.cell_costs
+    
+    field = array('i', [UNREACHABLE]) * (problem.width * problem.height)
+    field[target_cell] = 0
+    frontier = [(0, target_cell)]
+    while frontier:
+        dist, cell = heapq.heappop(frontier)
+        if dist > field[cell]:
+            continue
+        # Stepping from a neighbor into `cell` costs cell_costs[cell]
+        new_dist = dist + cell_costs[cell]
+        for k in range(offsets[cell], ends[cell]):
+            prev = neighbor_cells[k]
+            if new_dist < field[prev]:
+                field[prev] = new_dist
+                heapq.heappush(frontier, (new_dist, prev))
+    return field
+
+
+class TerrainHeuristic:
+    # Staged exact cost-to-go built from three backward Dijkstra fields (goal, chest, key).
+    # Without the key: cell -> key -> chest -> goal; with the key: cell -> chest -> goal;
+    # with the treasure: cell -> goal. The key -> chest -> goal legs are constant per map.
+    # These are true shortest-path costs, so the estimate is admissible and consistent.
+    def __init__(self, problem):
+        self.width = problem.width
+        self.to_goal = backward_distance_field(problem, problem.goal_cell)
+        self.to_chest = backward_distance_field(problem, problem.chest_cell)
+        self.to_key = backward_distance_field(problem, problem.key_cell)
+        self.chest_leg = self.to_goal[problem.chest_cell]
+        self.key_leg = self.to_chest[problem.key_cell] + self.chest_leg
+    
+    def estimate(self, state):
+        x, y, has_key, has_treasure = state
+        cell = y * self.width + x
+        if has_treasure:
+            return self.to_goal[cell]
+        if has_key:
+            return self.to_chest[cell] + self.chest_leg
+        return self.to_key[cell] + self.key_leg
+    
+    def index_heuristic(self):
+        to_goal, to_chest, to_key = self.to_goal, self.to_chest, self.to_key
+        chest_leg, key_leg = self.chest_leg, self.key_leg
+        
+        def h(index):
+            if index & 1:
+                return to_goal[index >> 2]
+            if index & 2:
+                return to_chest[index >> 2] + chest_leg
+            return to_key[index >> 2] + key_leg
+        
+        return h
+
+
+class CostToGoField:
+    # Exact cost-to-go over the whole packed state space ((y * W + x) << 2 | has_key << 1 |
+    # has_treasure), from one backward Dijkstra that starts at the goal with the treasure.
+    # Reversed edges also undo the inventory rules: a state on the key (or chest) cell can
+    # be entered from the same cell's states that did not hold the key (or treasure) yet.
+    # Afterwards the optimal cost from any start is one lookup, and the optimal path follows
+    # the field downhill. Built for one terrain and waypoint layout (PirateProblem.cost_to_go).
+    def __init__(self, problem):
+        # Only copies of the compiled tables are kept, not the problem itself:
+        # set_terrain patches the problem's tables in place, and a field still held after an
+        # edit keeps answering for the terrain it was built on
+        self.width = problem.width
+        self.neighbor_offsets = array('i', problem.neighbor_offsets)
+        self.neighbor_ends = array('i', problem.neighbor_ends)
+        self.neighbor_cells = array('i', problem.neighbor_cells)
+        self.neighbor_costs = array('b', problem.neighbor_costs)
+        self.key_cell = problem.key_cell
+        self.chest_cell = problem.chest_cell
+        offsets = problem.neighbor_offsets
+        ends = problem.neighbor_ends
+        neighbor_cells = problem.neighbor_cells
+        cell_costs = problem.cell_costs
+        key_cell = problem.key_cell
+        chest_cell = problem.chest_cell
+        
+        def entered_flags(flags, cell):
+            # Inventory after stepping into cell, same rules as get_successors
+            if cell == key_cell:
+                flags |= 2
+            if cell == chest_cell and flags & 2:
+                flags |= 1
+            return flags
+        
+        # Flags before entering the key or chest cell that lead to each flag value after it
+        special = {cell: [[before for before in range(4) if entered_flags(before, cell) == after]
+                          for after in range(4)] for cell in (key_cell, chest_cell)}
+        
+        field = array('i', [UNREACHABLE]) * (4 * problem.width * problem.height)
+        frontier = []
+        for flags in (1, 3):
+            goal_index = (problem.goal_cell << 2) | flags
+            field[goal_index] = 0
+            frontier.append((0, goal_index))
+        settled = 0
+        while frontier:
+            dist, index = heapq.heappop(frontier)
+            if dist > field[index]:
+                continue
+            settled += 1
+            cell = index >> 2
+            flags = index & 3
+            new_dist = dist + cell_costs[cell]
+            before = special[cell][flags] if cell in special else (flags,)
+            for k in range(offsets[cell], ends[cell]):
+                prev_cell = neighbor_cells[k] << 2
+                for prev_flags in before:
+                    prev = prev_cell | prev_flags
+                    if new_dist < field[prev]:
+                        field[prev] = new_dist
+                        heapq.heappush(frontier, (new_dist, prev))
+        self.field = field
+        self.settled = settled
+    
+    def cost(self, state):
+        # Optimal cost from state to the goal, None if the goal cannot be reached
+        x, y, has_key, has_treasure = state
+        cost = self.field[((y * self.width + x) << 2) | (has_key << 1) | has_treasure]
+        return None if cost == UNREACHABLE else cost
+    
+    def path(self, state):
+        # Optimal path of states from state to the goal, None if the goal cannot be reached
+        field = self.field
+        offsets = self.neighbor_offsets
+        ends = self.neighbor_ends
+        neighbor_cells = self.neighbor_cells
+        neighbor_costs = self.neighbor_costs
+        x, y, has_key, has_treasure = state
+        index = ((y * self.width + x) << 2) | (has_key << 1) | has_treasure
+        if field[index] == UNREACHABLE:
+            return None
+        path = [index]
+        while field[index]:
+            cell = index >> 2
+            flags = index & 3
+            for k in range(offsets[cell], ends[cell]):
+                ncell = neighbor_cells[k]
+                next_flags = flags
+                if ncell == self.key_cell:
+                    next_flags |= 2
+                if ncell == self.chest_cell and next_flags & 2:
+                    next_flags |= 1
+                next_index = (ncell << 2) | next_flags
+                if field[next_index] + neighbor_costs[k] == field[index]:
+                    index = next_index
+                    break
+            else:
+                raise RuntimeError(f"Cost-to-go field has no downhill neighbor at state {index}")
+            path.append(index)
+        states = []
+        for index in path:
+            y, x = divmod(index >> 2, self.width)
+            states.append((x, y, bool(index & 2), bool(index & 1)))
+        return states
+    
+    def index_heuristic(self):
+        # The field as a (perfect) heuristic on packed state indices
+        return self.field.__getitem__
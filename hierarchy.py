@@ -0,0 +1,277 @@
+import heapq
+
+from algorithms import cells_to_states, key_round_trip
+
+# Open border stretches at least this long get a transition near each end instead of one in the middle
+LONG_ENTRANCE = 6
+
+
+class HierarchicalPlanner:
+    # HPA*-style abstraction of a PirateProblem's compiled grid.
+    # The map is cut into cluster_size x cluster_size clusters. Each open stretch of a
+    # cluster border gets one or two transitions (a pair of facing passable cells), and the
+    # exact costs between all transition cells of a cluster are precomputed inside that cluster.
+    # Queries run A* on this small abstract graph and refine each abstract edge into cells.
+    # Paths are usually close to optimal but not guaranteed optimal.
+    # entrance_spacing adds extra transitions every that many cells along long stretches,
+    # trading preprocessing time for paths closer to optimal on mixed terrain.
+    def __init__(self, problem, cluster_size=16, entrance_spacing=None):
+        self.problem = problem
+        self.cluster_size = cluster_size
+        self.entrance_spacing = entrance_spacing
+        self.clusters_x = -(-problem.width // cluster_size)
+        self.clusters_y = -(-problem.height // cluster_size)
+        num_clusters = self.clusters_x * self.clusters_y
+        
+        # border (cluster, 'E' or 'S') -> [(cell, facing cell), ...]
+        self.borders = {}
+        # transition cell -> facing cells across a border (the step costs cell_costs[facing])
+        self.transitions = {}
+        # cluster -> {entrance cell: [(entrance cell, cost), ...]} for paths inside the cluster
+        self.intra = [None] * num_clusters
+        
+        for cluster in range(num_clusters):
+            self._build_border((cluster, 'E'))
+            self._build_border((cluster, 'S'))
+        for cluster in range(num_clusters):
+            self._build_intra(cluster)
+        self._dirty = set()
+    
+    def cluster_of(self, cell):
+        y, x = divmod(cell, self.problem.width)
+        return (y // self.cluster_size) * self.clusters_x + x // self.cluster_size
+    
+    def _cluster_bounds(self, cluster):
+        cy, cx = divmod(cluster, self.clusters_x)
+        x0, y0 = cx * self.cluster_size, cy * self.cluster_size
+        return x0, y0, min(x0 + self.cluster_size, self.problem.width), min(y0 + self.cluster_size, self.problem.height)
+    
+    def _border_cells(self, border):
+        # Facing cell pairs along one border, [] on the map edge
+        cluster, side = border
+        cy, cx = divmod(cluster, self.clusters_x)
+        x0, y0, x1, y1 = self._cluster_bounds(cluster)
+        width = self.problem.width
+        if side == 'E':
+            if cx + 1 >= self.clusters_x:
+                return []
+            return [(y * width + x1 - 1, y * width + x1) for y in range(y0, y1)]
+        if cy + 1 >= self.clusters_y:
+            return []
+        return [((y1 - 1) * width + x, y1 * width + x) for x in range(x0, x1)]
+    
+    def _cluster_border_keys(self, cluster):
+        cy, cx = divmod(cluster, self.clusters_x)
+        keys = [(cluster, 'E'), (cluster, 'S')]
+        if cx > 0:
+            keys.append((cluster - 1, 'E'))
+        if cy > 0:
+            keys.append((cluster - self.clusters_x, 'S'))
+        return keys
+    
+    def _build_border(self, border):
+        # Drop the old transitions of this border, then place new ones on each open stretch
+        for a, b in self.borders.pop(border, []):
+            self.transitions[a].remove(b)
+            self.transitions[b].remove(a)
+        
+        cell_costs = self.problem.cell_costs
+        stretches = []
+        current = []
+        for a, b in self._border_cells(border):
+            if cell_costs[a] > 0 and cell_costs[b] > 0:
+                current.append((a, b))
+            elif current:
+                stretches.append(current)
+                current = []
+        if current:
+            stretches.append(current)
+        
+        pairs = []
+        for stretch in stretches:
+            if len(stretch) >= LONG_ENTRANCE:
+                step = self.entrance_spacing or len(stretch) - 1
+                pairs.extend(stretch[i] for i in range(0, len(stretch) - 1, step))
+                pairs.append(stretch[-1])
+            else:
+                pairs.append(stretch[len(stretch) // 2])
+        for a, b in pairs:
+            self.transitions.setdefault(a, []).append(b)
+            self.transitions.setdefault(b, []).append(a)
+        self.borders[border] = pairs
+    
+    def _entrances(self, cluster):
+        entrances = set()
+        for border in self._cluster_border_keys(cluster):
+            for a, b in self.borders.get(border, []):
+                entrances.add(a if self.cluster_of(a) == cluster else b)
+        return entrances
+    
+    def _build_intra(self, cluster):
+        entrances = self._entrances(cluster)
+        edges = {}
+        for entrance in entrances:
+            dist, _, _ = self._local_search(entrance, cluster)
+            edges[entrance] = [(other, dist[other]) for other in entrances
+                               if other != entrance and other in dist]
+        self.intra[cluster] = edges
+    
+    def _local_search(self, source, cluster, target=None, reverse=False):
+        # Dijkstra confined to one cluster. Forward: dist[c] = cost source -> c.
+        # reverse=True: dist[c] = cost c -> source. Stops early once target is settled.
+        problem = self.problem
+        offsets, ends = problem.neighbor_offsets, problem.neighbor_ends
+        neighbor_cells, cell_costs = problem.neighbor_cells, problem.cell_costs
+        x0, y0, x1, y1 = self._cluster_bounds(cluster)
+        width = problem.width
+        
+        dist = {source: 0}
+        parent = {source: None}
+        frontier = [(0, source)]
+        nodes_expanded = 0
+        while frontier:
+            d, cell = heapq.heappop(frontier)
+            if d > dist[cell]:
+                continue
+            if cell == target:
+                break
+            nodes_expanded += 1
+            for k in range(offsets[cell], ends[cell]):
+                ncell = neighbor_cells[k]
+                ny, nx = divmod(ncell, width)
+                if not (x0 <= nx < x1 and y0 <= ny < y1):
+                    continue
+                nd = d + (cell_costs[cell] if reverse else cell_costs[ncell])
+                if nd < dist.get(ncell, nd + 1):
+                    dist[ncell] = nd
+                    parent[ncell] = cell
+                    heapq.heappush(frontier, (nd, ncell))
+        return dist, parent, nodes_expanded
+    
+    def set_terrain(self, pos, terrain):
+        # Edit one tile; only its cluster is rebuilt, lazily on the next query
+        self.problem.set_terrain(pos, terrain)
+        self._dirty.add(self.cluster_of(pos[1] * self.problem.width + pos[0]))
+    
+    def _refresh(self):
+        # Rebuild the borders of edited clusters, then the intra edges of every cluster
+        # whose entrance set may have moved (the edited ones and their four neighbors)
+        if not self._dirty:
+            return
+        affected = set()
+        for cluster in self._dirty:
+            for border in self._cluster_border_keys(cluster):
+                self._build_border(border)
+                for a, b in self._border_cells(border)[:1]:
+                    affected.add(self.cluster_of(a))
+                    affected.add(self.cluster_of(b))
+            affected.add(cluster)
+        for cluster in affected:
+            self._build_intra(cluster)
+        self._dirty.clear()
+    
+    def _plan_leg(self, source, target):
+        # Abstract A* from source to target, then refinement into a cell path.
+        # Returns (cost, cells, expanded) or None.
+        if source == target:
+            return 0, [source], 0
+        width = self.problem.width
+        cell_costs = self.problem.cell_costs
+        source_cluster, target_cluster = self.cluster_of(source), self.cluster_of(target)
+        
+        # Temporarily hook source and target into their clusters' entrances
+        dist, _, nodes_expanded = self._local_search(source, source_cluster)
+        source_edges = [(cell, dist[cell]) for cell in self._entrances(source_cluster) if cell in dist]
+        if target in dist:
+            source_edges.append((target, dist[target]))
+        dist, _, expanded = self._local_search(target, target_cluster, reverse=True)
+        nodes_expanded += expanded
+        target_edges = {cell: dist[cell] for cell in self._entrances(target_cluster) if cell in dist}
+        
+        ty, tx = divmod(target, width)
+        g = {source: 0}
+        parent = {source: None}
+        frontier = [(0, source)]
+        while frontier:
+            f, cell = heapq.heappop(frontier)
+            if cell == target:
+                break
+            cost = g[cell]
+            if f > cost + self._estimate(cell, tx, ty):
+                continue
+            nodes_expanded += 1
+            edges = list(source_edges) if cell == source else list(self.intra[self.cluster_of(cell)].get(cell, []))
+            edges.extend((other, cell_costs[other]) for other in self.transitions.get(cell, []))
+            if cell in target_edges:
+                edges.append((target, target_edges[cell]))
+            for other, step in edges:
+                new_cost = cost + step
+                if new_cost < g.get(other, new_cost + 1):
+                    g[other] = new_cost
+                    parent[other] = cell
+                    heapq.heappush(frontier, (new_cost + self._estimate(other, tx, ty), other))
+        else:
+            return None
+        
+        abstract = []
+        cell = target
+        while cell is not None:
+            abstract.append(cell)
+            cell = parent[cell]
+        abstract.reverse()
+        
+        # Refine: transitions are single steps, everything else is a path inside one cluster
+        cells = [source]
+        for a, b in zip(abstract, abstract[1:]):
+            cluster = self.cluster_of(a)
+            if cluster != self.cluster_of(b):
+                cells.append(b)
+                continue
+            _, local_parent, expanded = self._local_search(a, cluster, target=b)
+            nodes_expanded += expanded
+            segment = []
+            cell = b
+            while cell != a:
+                segment.append(cell)
+                cell = local_parent[cell]
+            cells.extend(reversed(segment))
+        return g[target], cells, nodes_expanded
+    
+    def _estimate(self, cell, tx, ty):
+        y, x = divmod(cell, self.problem.width)
+        return abs(x - tx) + abs(y - ty)
+    
+    def solve(self):
+        # Same result dict as the flat solvers; legs follow the fixed key -> chest -> goal order.
+        # A ship starting on the key steps off and back to pick it up, as in waypoint_solve.
+        self._refresh()
+        problem = self.problem
+        waypoints = [problem.start[1] * problem.width + problem.start[0],
+                     problem.key_cell, problem.chest_cell, problem.goal_cell]
+        total_cost = 0
+        nodes_expanded = 0
+        cells = [waypoints[0]]
+        for leg_index, (source, target) in enumerate(zip(waypoints, waypoints[1:])):
+            if leg_index == 0 and source == target:
+                trip = key_round_trip(problem)
+                leg = trip and (trip[0], trip[1], 0)
+            else:
+                leg = self._plan_leg(source, target)
+            if leg is None:
+                return {'status': 'failure', 'expanded': nodes_expanded, 'max_frontier': None}
+            leg_cost, leg_cells, leg_expanded = leg
+            total_cost += leg_cost
+            nodes_expanded += leg_expanded
+            cells.extend(leg_cells[1:])
+        
+        return {
+            'status': 'success',
+            'path': cells_to_states(problem, cells),
+            'cost': total_cost,
+            'expanded': nodes_expanded,
+            'max_frontier': None
+        }
+
+
+def hpa_solve(problem, cluster_size=16, entrance_spacing=None):
+    return HierarchicalPlanner(problem, cluster_size, entrance_spacing).solve()
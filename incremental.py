@@ -0,0 +1,146 @@
+import heapq
+from array import array
+
+from heuristic import pirate_index_heuristic
+
+INF_COST = 2 ** 31 - 1
+
+# Inventory flag combinations a state can actually have (treasure implies key)
+VALID_FLAGS = (0, 2, 3)
+
+
+class IncrementalPlanner:
+    # Lifelong Planning A* (LPA*) over the packed (cell, has_key, has_treasure) states of a
+    # PirateProblem. Terrain edits only touch the states of the edited cell; the next plan()
+    # repairs the previous search tree instead of starting over.
+    # The Manhattan staged estimate is used because it stays admissible and consistent
+    # whatever the terrain becomes (every move costs at least 1).
+    def __init__(self, problem):
+        self.problem = problem
+        num_states = 4 * problem.width * problem.height
+        self.g = array('i', [INF_COST]) * num_states
+        self.rhs = array('i', [INF_COST]) * num_states
+        self.heuristic = pirate_index_heuristic(problem.width, problem.key_pos,
+                                                problem.chest_pos, problem.goal)
+        self.start = problem.encode_state(problem.get_start_state())
+        self.goal = (problem.goal_cell << 2) | 3
+        self.rhs[self.start] = 0
+        self.open = []
+        self._push(self.start)
+        self.max_frontier = 1
+    
+    def _key(self, index):
+        m = min(self.g[index], self.rhs[index])
+        return (m + self.heuristic(index), m)
+    
+    def _push(self, index):
+        k1, k2 = self._key(index)
+        heapq.heappush(self.open, (k1, k2, index))
+    
+    def _next_flags(self, flags, cell):
+        # Same inventory rules as PirateProblem.get_successors
+        if cell == self.problem.key_cell:
+            flags |= 2
+        if cell == self.problem.chest_cell and flags & 2:
+            flags |= 1
+        return flags
+    
+    def _successors(self, index):
+        problem = self.problem
+        cell, flags = index >> 2, index & 3
+        for k in range(problem.neighbor_offsets[cell], problem.neighbor_ends[cell]):
+            ncell = problem.neighbor_cells[k]
+            yield (ncell << 2) | self._next_flags(flags, ncell), problem.neighbor_costs[k]
+    
+    def _predecessors(self, index):
+        problem = self.problem
+        cell, flags = index >> 2, index & 3
+        move_cost = problem.cell_costs[cell]
+        if move_cost < 0:
+            return
+        # Passable neighbors of a cell are exactly the cells that can step into it
+        for k in range(problem.neighbor_offsets[cell], problem.neighbor_ends[cell]):
+            pcell = problem.neighbor_cells[k]
+            for pflags in VALID_FLAGS:
+                if self._next_flags(pflags, cell) == flags:
+                    yield (pcell << 2) | pflags, move_cost
+    
+    def _update_vertex(self, index):
+        if index != self.start:
+            best = INF_COST
+            for prev, move_cost in self._predecessors(index):
+                if self.g[prev] != INF_COST and self.g[prev] + move_cost < best:
+                    best = self.g[prev] + move_cost
+            self.rhs[index] = best
+        if self.g[index] != self.rhs[index]:
+            self._push(index)
+    
+    def _compute_shortest_path(self):
+        g, rhs, open_list, goal = self.g, self.rhs, self.open, self.goal
+        nodes_expanded = 0
+        while open_list and (open_list[0][:2] < self._key(goal) or rhs[goal] != g[goal]):
+            if len(open_list) > self.max_frontier:
+                self.max_frontier = len(open_list)
+            k1, k2, index = heapq.heappop(open_list)
+            
+            # Stale entries: the state became consistent, or was re-pushed with a newer key
+            if g[index] == rhs[index] or (k1, k2) != self._key(index):
+                continue
+            
+            nodes_expanded += 1
+            if g[index] > rhs[index]:
+                # Overconsistent: settle g and relax successors
+                g[index] = rhs[index]
+                for succ, move_cost in self._successors(index):
+                    if succ != self.start and g[index] + move_cost < rhs[succ]:
+                        rhs[succ] = g[index] + move_cost
+                        if g[succ] != rhs[succ]:
+                            self._push(succ)
+            else:
+                # Underconsistent: invalidate and re-derive everything that depended on it
+                old_g = g[index]
+                g[index] = INF_COST
+                self._update_vertex(index)
+                for succ, move_cost in self._successors(index):
+                    if succ != self.start and rhs[succ] == old_g + move_cost:
+                        self._update_vertex(succ)
+        return nodes_expanded
+    
+    def set_terrain(self, pos, terrain):
+        # Apply one terrain edit; only edges into the edited cell change cost
+        self.problem.set_terrain(pos, terrain)
+        cell = pos[1] * self.problem.width + pos[0]
+        for flags in VALID_FLAGS:
+            self._update_vertex((cell << 2) | flags)
+    
+    def apply_edits(self, edits):
+        # edits: iterable of ((x, y), terrain); returns the repaired plan
+        for pos, terrain in edits:
+            self.set_terrain(pos, terrain)
+        return self.plan()
+    
+    def plan(self):
+        nodes_expanded = self._compute_shortest_path()
+        cost = self.g[self.goal]
+        if cost == INF_COST:
+            return {'status': 'failure', 'expanded': nodes_expanded, 'max_frontier': self.max_frontier}
+        
+        # Walk back along predecessors whose g accounts for the step cost
+        path = [self.goal]
+        index = self.goal
+        while index != self.start:
+            for prev, move_cost in self._predecessors(index):
+                if self.g[prev] != INF_COST and self.g[prev] + move_cost == self.g[index]:
+                    index = prev
+                    break
+            else:
+                raise RuntimeError("Inconsistent search tree while extracting path")
+            path.append(index)
+        
+        return {
+            'status': 'success',
+            'path': [self.problem.decode_state(index) for index in reversed(path)],
+            'cost': cost,
+            'expanded': nodes_expanded,
+            'max_frontier': self.max_frontier
+        }
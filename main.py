@@ -1,9 +1,14 @@
+import argparse
+import functools
+import os
 import pygame
-import random
 import sys
 
-from algorithms import ucs_search, astar_search
-from heuristic import pirate_heuristic
+from algorithms import Node, ucs_search, astar_search, anytime_search, SearchStats
+from mapfile import load_map
+from problem import PirateProblem, generate_map
+from scheduler import SearchStepper, BackgroundStepper, ProcessStepper, SEARCH_BUDGETS_MS
+from tracefile import TraceReader, TraceWriter, record
 
 SCREEN_WIDTH = 1000
 SCREEN_HEIGHT = 700
@@ -25,205 +30,486 @@ C_SHIP = (139, 69, 19)
 C_KEY = (255, 215, 0)
 C_CHEST = (148, 0, 211)
 
-# Terrain Movement Costs
-COST_SAND = 1
-COST_JUNGLE = 5
-COST_LAKE = 10
 
+@functools.lru_cache(maxsize=None)
+def get_font(size, bold=False):
+    # SysFont scans the system font list, so fonts are created once and reused every frame
+    return pygame.font.SysFont("Arial", size, bold=bold)
 
-class PirateProblem:
-    def __init__(self, grid, start, key_pos, chest_pos, goal):
-        self.grid = grid
-        self.start = start
-        self.key_pos = key_pos
-        self.chest_pos = chest_pos
-        self.goal = goal
-        self.width = len(grid[0])
-        self.height = len(grid)
+
+TERRAIN_COLORS = {'LAVA': C_LAVA, 'JUNGLE': C_JUNGLE, 'LAKE': C_LAKE, 'SAND': C_SAND}
+
+# Camera zoom levels in screen pixels per tile. Below 1 px per tile the map is drawn
+# as aggregated (smoothscaled) blocks; grid lines only appear from GRID_LINE_ZOOM up.
+ZOOM_LEVELS = [0.25, 0.5, 1, 2, 4, 8, 12, 16, 24, 32, 40, 56, 80]
+GRID_LINE_ZOOM = 8
+PAN_SPEED = 12  # pixels per frame while an arrow key is held
+
+# Trace playback: speeds in events per second ([ and ] halve/double), the timeline bar in the
+# sidebar, and how many overlay cells a seek may patch before the view is re-rendered instead
+PLAYBACK_SPEEDS = (1, 1 << 20)
+PLAYBACK_DEFAULT_SPEED = 64
+TIMELINE_RECT = pygame.Rect(MAP_WIDTH + 20, SCREEN_HEIGHT - 60, SIDEBAR_WIDTH - 40, 16)
+SEEK_PATCH_LIMIT = 2000
+
+# Split compare view: two panes side by side in the map area
+COMPARE_GAP = 4
+PANE_WIDTH = (MAP_WIDTH - COMPARE_GAP) // 2
+
+# Rough memory of an in-process ucs_search/astar_search for the compare sidebar: every
+# expanded or frontier node (Node, its attribute dict and state tuple) plus an explored-dict slot
+_sample_node = Node((0, 0, False, False), cost=0, heuristic=0)
+NODE_BYTES = sys.getsizeof(_sample_node) + sys.getsizeof(_sample_node.__dict__) + sys.getsizeof(_sample_node.state)
+EXPLORED_ENTRY_BYTES = 48
+
+
+class Camera:
+    # Viewport onto the map area: (x, y) is the world pixel at the top-left of the view
+    def __init__(self, cols, rows, view_width=MAP_WIDTH, view_height=SCREEN_HEIGHT):
+        self.cols = cols
+        self.rows = rows
+        self.view_width = view_width
+        self.view_height = view_height
+        self.zoom_index = ZOOM_LEVELS.index(GRID_SIZE)
+        self.x = 0
+        self.y = 0
+        # Bumped on every pan/zoom so cached view layers know to re-render
+        self.version = 0
     
-    def get_start_state(self):
-        return (self.start[0], self.start[1], False, False)
+    @property
+    def tile_size(self):
+        return ZOOM_LEVELS[self.zoom_index]
     
-    def is_goal(self, state):
-        x, y, has_key, has_treasure = state
-        return has_treasure and (x, y) == self.goal
+    def _clamp(self):
+        ts = self.tile_size
+        self.x = int(max(0, min(self.x, self.cols * ts - self.view_width)))
+        self.y = int(max(0, min(self.y, self.rows * ts - self.view_height)))
+        self.version += 1
     
-    def get_successors(self, state):
-        x, y, has_key, has_treasure = state
-        successors = []
-        
-        # 4-directional movement
-        for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
-            nx, ny = x + dx, y + dy
-            
-            # Boundary check
-            if not (0 <= nx < self.width and 0 <= ny < self.height):
-                continue
-            
-            terrain = self.grid[ny][nx]
-            
-            # Lava is impassable
-            if terrain == 'LAVA':
-                continue
-            
-            # Determine movement cost by terrain
-            if terrain == 'SAND':
-                move_cost = COST_SAND
-            elif terrain == 'JUNGLE':
-                move_cost = COST_JUNGLE
-            elif terrain == 'LAKE':
-                move_cost = COST_LAKE
+    def pan(self, dx, dy):
+        self.x += dx
+        self.y += dy
+        self._clamp()
+    
+    def zoom(self, steps, anchor=None):
+        # Zoom in/out by whole levels, keeping the tile under `anchor` (screen px) in place
+        ax, ay = anchor or (self.view_width // 2, self.view_height // 2)
+        old = self.tile_size
+        self.zoom_index = max(0, min(len(ZOOM_LEVELS) - 1, self.zoom_index + steps))
+        scale = self.tile_size / old
+        self.x = (self.x + ax) * scale - ax
+        self.y = (self.y + ay) * scale - ay
+        self._clamp()
+    
+    def fit(self):
+        # Largest zoom level that shows the whole map
+        fits = [i for i, ts in enumerate(ZOOM_LEVELS)
+                if self.cols * ts <= self.view_width and self.rows * ts <= self.view_height]
+        self.zoom_index = fits[-1] if fits else 0
+        self.x = self.y = 0
+        self._clamp()
+    
+    def visible_tiles(self):
+        # Tile range (x0, y0, x1, y1), end-exclusive, that intersects the viewport
+        ts = self.tile_size
+        x0, y0 = int(self.x // ts), int(self.y // ts)
+        x1 = min(self.cols, int((self.x + self.view_width) // ts) + 1)
+        y1 = min(self.rows, int((self.y + self.view_height) // ts) + 1)
+        return x0, y0, x1, y1
+    
+    def is_visible(self, x, y):
+        x0, y0, x1, y1 = self.visible_tiles()
+        return x0 <= x < x1 and y0 <= y < y1
+    
+    def tile_center(self, x, y):
+        ts = self.tile_size
+        return (int(x * ts + ts / 2 - self.x), int(y * ts + ts / 2 - self.y))
+    
+    def cell_rect(self, x, y):
+        ts = self.tile_size
+        left, top = int(x * ts - self.x), int(y * ts - self.y)
+        return pygame.Rect(left, top, max(1, int((x + 1) * ts - self.x) - left),
+                           max(1, int((y + 1) * ts - self.y) - top))
+
+
+class ExploredOverlay:
+    # Explored set rebuilt from the search's incremental events, kept as a persistent
+    # alpha surface with one pixel per tile: each newly explored state only touches its own cell.
+    def __init__(self, cols, rows):
+        self.states = set()
+        self.counts = {}
+        self.surface = pygame.Surface((cols, rows), pygame.SRCALPHA)
+        # One explored layer per (x, y, has_key, has_treasure) state stacks on the same cell;
+        # precompute the alpha of n stacked C_EXPLORED layers
+        alpha = C_EXPLORED[3] / 255
+        self.layer_colors = [C_EXPLORED[:3] + (round(255 * (1 - (1 - alpha) ** n)),) for n in range(5)]
+        self.dirty = []
+        self.needs_full_redraw = True
+    
+    def reset(self):
+        self.states.clear()
+        self.counts.clear()
+        self.surface.fill((0, 0, 0, 0))
+        self.dirty.clear()
+        self.needs_full_redraw = True
+    
+    def apply(self, event):
+        if 'explored_set' in event:
+            # Periodic snapshot: resync in case events were dropped
+            self.reset()
+            for state in event['explored_set']:
+                self._add(state)
+            self.dirty.clear()
+        elif event['event'] == 'expand':
+            self._add(event['state'])
+    
+    def _add(self, state):
+        if state in self.states:
+            return
+        self.states.add(state)
+        x, y, _, _ = state
+        count = self.counts.get((x, y), 0) + 1
+        self.counts[(x, y)] = count
+        self.surface.set_at((x, y), self.layer_colors[min(count, 4)])
+        self.dirty.append((x, y))
+    
+    def set_cell(self, x, y, count):
+        # Shade a cell for `count` explored states; trace playback keeps its own counts
+        self.surface.set_at((x, y), self.layer_colors[min(count, 4)])
+        self.dirty.append((x, y))
+    
+    def load_counts(self, counts):
+        # Replace the whole layer from a bytearray of per-cell explored counts (row by row)
+        cols, rows = self.surface.get_size()
+        pixels = bytearray(4 * cols * rows)
+        for channel in range(3):
+            pixels[channel::4] = bytes([C_EXPLORED[channel]]) * (cols * rows)
+        alpha_table = bytes(self.layer_colors[min(count, 4)][3] for count in range(256))
+        pixels[3::4] = bytes(counts).translate(alpha_table)
+        self.surface = pygame.image.frombuffer(pixels, (cols, rows), 'RGBA').copy()
+        self.dirty.clear()
+        self.needs_full_redraw = True
+
+
+class TracePlayer:
+    # Playback position in a recorded trace (tracefile.TraceReader). `position` counts the
+    # events shown: the overlay holds the states explored by the first `position` events and
+    # `event` is the last of them. Seeking only decodes the target event (from the nearest
+    # checkpoint) and moves the per-cell explored counts by the states in between; long
+    # jumps re-shade the overlay in one pass instead of cell by cell.
+    def __init__(self, reader, overlay):
+        self.reader = reader
+        self.overlay = overlay
+        self.counts = bytearray(len(reader.grid) * reader.width)
+        self.position = 0
+        self.event = None
+        self.explored = 0
+        self.playing = False
+        self.reverse = False
+        self.speed = PLAYBACK_DEFAULT_SPEED
+        self._carry = 0.0
+    
+    @property
+    def finished(self):
+        return self.position == self.reader.num_events
+    
+    def seek(self, position):
+        reader, overlay = self.reader, self.overlay
+        position = max(0, min(reader.num_events, position))
+        self.event = reader.event(position - 1) if position else None
+        explored = self.event['explored'] if self.event else 0
+        order = reader.explored_order
+        counts = self.counts
+        if abs(explored - self.explored) > SEEK_PATCH_LIMIT:
+            if explored < self.explored - explored:
+                # Rewinding most of the way: counting from the start is cheaper
+                counts[:] = bytes(len(counts))
+                for index in order[:explored]:
+                    counts[index >> 2] += 1
+            elif explored > self.explored:
+                for index in order[self.explored:explored]:
+                    counts[index >> 2] += 1
             else:
-                move_cost = COST_SAND
-            
-            # Update inventory flags
-            new_key = has_key or ((nx, ny) == self.key_pos)
-            new_treasure = has_treasure or ((nx, ny) == self.chest_pos and new_key)
-            
-            next_state = (nx, ny, new_key, new_treasure)
-            successors.append((next_state, move_cost))
-        
-        return successors
-    
-    def heuristic(self, state):
-        return pirate_heuristic(state, self.key_pos, self.chest_pos, self.goal)
-
-
-def generate_map():
-    # Procedurally generate terrain grid with:
-    # - Lava (impassable) ~12%
-    # - Jungle (cost 5) ~25%
-    # - Lake (cost 10) ~8%
-    # - Sand (cost 1) default
-    grid = [['SAND' for _ in range(COLS)] for _ in range(ROWS)]
-    
-    # Terrain generation
-    for r in range(ROWS):
-        for c in range(COLS):
-            noise = random.random()
-            if noise < 0.12:
-                grid[r][c] = 'LAVA'
-            elif noise < 0.37:
-                grid[r][c] = 'JUNGLE'
-            elif noise < 0.45:
-                grid[r][c] = 'LAKE'
-    
-    # Place start and goal at opposite corners
-    start = (2, 2)  # Top-left
-    goal = (COLS - 3, ROWS - 3)  # Bottom-right
-    
-    # Place key and chest at other positions
-    key = (COLS - 3, 2)  # Top-right
-    chest = (2, ROWS - 3)  # Bottom-left
-    
-    # Clear critical areas to ensure solvability
-    for pos in [start, goal, key, chest]:
-        grid[pos[1]][pos[0]] = 'SAND'
-        for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (-1, -1), (1, -1), (-1, 1)]:
-            nx, ny = pos[0] + dx, pos[1] + dy
-            if 0 <= nx < COLS and 0 <= ny < ROWS:
-                grid[ny][nx] = 'SAND'
-    
-    return grid, start, key, chest, goal
-
-
-def draw_map(screen, grid, start, goal, key, chest, search_data, path, animate_step):
-    
-    # Draw terrain tiles
-    for r in range(ROWS):
-        for c in range(COLS):
-            rect = (c * GRID_SIZE, r * GRID_SIZE, GRID_SIZE, GRID_SIZE)
-            
-            # Terrain color
-            terrain = grid[r][c]
-            if terrain == 'LAVA':
-                color = C_LAVA
-            elif terrain == 'JUNGLE':
-                color = C_JUNGLE
-            elif terrain == 'LAKE':
-                color = C_LAKE
+                for index in order[explored:self.explored]:
+                    counts[index >> 2] -= 1
+            overlay.load_counts(counts)
+        else:
+            step = 1 if explored > self.explored else -1
+            changed = order[self.explored:explored] if step > 0 else order[explored:self.explored]
+            for index in changed:
+                cell = index >> 2
+                counts[cell] += step
+                y, x = divmod(cell, reader.width)
+                overlay.set_cell(x, y, counts[cell])
+        self.position = position
+        self.explored = explored
+    
+    def update(self, dt):
+        # Advance by speed * dt events while playing; stops at either end
+        if not self.playing:
+            return
+        self._carry += self.speed * dt
+        steps = int(self._carry)
+        self._carry -= steps
+        if steps:
+            self.seek(self.position - steps if self.reverse else self.position + steps)
+        if self.position == (0 if self.reverse else self.reader.num_events):
+            self.playing = False
+    
+    def set_speed(self, speed):
+        self.speed = max(PLAYBACK_SPEEDS[0], min(PLAYBACK_SPEEDS[1], speed))
+
+
+def compare_search(name, grid, start, key, chest, goal, record_dir=None):
+    # Search generator built inside a compare worker process (ProcessStepper pickles this call)
+    problem = PirateProblem(grid, start, key, chest, goal)
+    search_gen = ucs_search(problem) if name == 'ucs' else astar_search(problem)
+    if record_dir:
+        os.makedirs(record_dir, exist_ok=True)
+        search_gen = record(search_gen, TraceWriter(os.path.join(record_dir, f"{name}.ptrc"), problem, name))
+    return search_gen
+
+
+class ComparePane:
+    # One half of the split compare view: its own camera, cached layers and explored overlay,
+    # and the search it shows. Both panes are stepped every frame with half the budget each.
+    def __init__(self, label, index, grid, start, goal, key, chest):
+        cols, rows = len(grid[0]), len(grid)
+        self.label = label
+        self.rect = pygame.Rect(index * (PANE_WIDTH + COMPARE_GAP), 0, PANE_WIDTH, SCREEN_HEIGHT)
+        self.camera = Camera(cols, rows, PANE_WIDTH, SCREEN_HEIGHT)
+        self.camera.fit()
+        self.layers = MapLayers(grid, start, goal, key, chest, self.camera)
+        self.overlay = ExploredOverlay(cols, rows)
+        self.stepper = None
+        self.search_data = None
+        self.result = None
+        self.path = []
+        self.animate_step = 0
+    
+    def step(self):
+        # Consume this frame's events; returns the final result when the search just finished
+        for result in self.stepper.step():
+            if result['status'] == 'running':
+                self.search_data = result
+                self.overlay.apply(result)
             else:
-                color = C_SAND
-            
-            pygame.draw.rect(screen, color, rect)
-            pygame.draw.rect(screen, (0, 0, 0), rect, 1)
-    
-    # Draw explored nodes (semi-transparent overlay)
-    if search_data and 'explored_set' in search_data:
-        surf = pygame.Surface((GRID_SIZE, GRID_SIZE), pygame.SRCALPHA)
-        surf.fill(C_EXPLORED)
-        for state in search_data['explored_set']:
-            x, y, _, _ = state
-            screen.blit(surf, (x * GRID_SIZE, y * GRID_SIZE))
-    
-    # Highlight current frontier node
-    if search_data and 'current_node' in search_data:
-        node = search_data['current_node']
-        x, y, _, _ = node.state
-        pygame.draw.rect(screen, C_FRONTIER, 
-                        (x * GRID_SIZE + 2, y * GRID_SIZE + 2, 
-                         GRID_SIZE - 4, GRID_SIZE - 4), 4)
-    
-    # Draw final path
-    if path and len(path) > 1:
-        points = [(p[0] * GRID_SIZE + GRID_SIZE // 2, 
-                  p[1] * GRID_SIZE + GRID_SIZE // 2) for p in path]
-        if len(points) > 1:
-            pygame.draw.lines(screen, C_PATH, False, points, 5)
-    
-    # Draw icons
-    def draw_icon(pos, color, shape, label):
-        cx = pos[0] * GRID_SIZE + GRID_SIZE // 2
-        cy = pos[1] * GRID_SIZE + GRID_SIZE // 2
+                self.result = result
+                self.path = result.get('path', [])
+                return result
+        if self.path and self.animate_step < len(self.path) * 10:
+            self.animate_step += 1
+        return None
+    
+    def draw(self, screen):
+        # draw_map into the pane's part of the screen; dirty rects come back in screen space
+        dirty = draw_map(screen.subsurface(self.rect), self.layers, self.camera, self.search_data,
+                         self.overlay, self.path, self.animate_step)
+        return [rect.move(self.rect.topleft) for rect in dirty]
+    
+    def status_lines(self):
+        # Live throughput, frontier and memory of this pane's search
+        data = self.result or self.search_data
+        if not data:
+            return [f"{self.label}: starting"]
+        expanded = data['expanded']
+        rate = expanded / self.stepper.busy_time if self.stepper.busy_time else 0
+        frontier = data.get('frontier_size', 0)
+        if isinstance(self.stepper, ProcessStepper) and self.stepper.peak_rss_kb:
+            memory = f"rss {self.stepper.peak_rss_kb / 1024:.1f} MB"
+        else:
+            memory = f"~{((expanded + frontier) * NODE_BYTES + expanded * EXPLORED_ENTRY_BYTES) / 1024:,.0f} KB"
+        state = "done" if self.result else f"frontier {frontier:,}"
+        return [f"{self.label}: {rate:,.0f} exp/s  {state}", f"    {expanded:,} expanded  {memory}"]
+    
+    def stop(self):
+        if self.stepper:
+            self.stepper.stop()
+
+
+def render_terrain(grid):
+    # Static terrain layer with one pixel per tile, built once per map from raw RGB bytes
+    rows, cols = len(grid), len(grid[0])
+    color_bytes = {terrain: bytes(color) for terrain, color in TERRAIN_COLORS.items()}
+    data = b''.join(color_bytes.get(terrain, color_bytes['SAND']) for row in grid for terrain in row)
+    return pygame.image.frombuffer(data, (cols, rows), 'RGB').copy()
+
+
+def draw_icon(surface, center, color, shape, label):
+    cx, cy = center
+    
+    if shape == 'start':
+        # Green circle for START
+        pygame.draw.circle(surface, (0, 200, 0), (cx, cy), 14)
+        pygame.draw.circle(surface, (0, 255, 0), (cx, cy), 14, 3)
+    elif shape == 'goal':
+        # Red square for GOAL
+        pygame.draw.rect(surface, (200, 0, 0), (cx - 14, cy - 14, 28, 28))
+        pygame.draw.rect(surface, (255, 0, 0), (cx - 14, cy - 14, 28, 28), 3)
+    elif shape == 'key':
+        # Gold key
+        pygame.draw.circle(surface, color, (cx, cy), 10)
+        pygame.draw.circle(surface, (200, 170, 0), (cx, cy), 10, 3)
+    elif shape == 'chest':
+        # Treasure chest
+        pygame.draw.rect(surface, color, (cx - 12, cy - 9, 24, 18))
+        pygame.draw.rect(surface, (100, 0, 130), (cx - 12, cy - 9, 24, 18), 3)
+    
+    # Label
+    label_surf = get_font(11, bold=True).render(label, True, (255, 255, 255))
+    label_rect = label_surf.get_rect(center=(cx, cy + 22))
+    pygame.draw.rect(surface, (0, 0, 0), label_rect.inflate(6, 2))
+    surface.blit(label_surf, label_rect)
+
+
+class MapLayers:
+    # Cached render layers for one map. The terrain lives at one pixel per tile; the
+    # viewport-sized `view` (terrain + explored + grid lines) and `decorations`
+    # (path + icons) are re-rendered only when the camera, path or overlay resets.
+    # Everything drawn per frame is culled to the visible tiles, so cost follows the
+    # screen size rather than the map size.
+    def __init__(self, grid, start, goal, key, chest, camera):
+        self.terrain = render_terrain(grid)
+        self.waypoints = (start, goal, key, chest)
+        self.view = pygame.Surface((camera.view_width, camera.view_height))
+        self.decorations = pygame.Surface((camera.view_width, camera.view_height), pygame.SRCALPHA)
+        self.path = None
+        self.camera_version = None
+        self.last_dynamic = []
+        self.needs_full_redraw = True
+    
+    def render_view(self, camera, overlay):
+        self.view.fill((0, 0, 0))
+        ts = camera.tile_size
+        x0, y0, x1, y1 = camera.visible_tiles()
+        if x1 <= x0 or y1 <= y0:
+            return
+        area = pygame.Rect(x0, y0, x1 - x0, y1 - y0)
+        size = (max(1, round(area.width * ts)), max(1, round(area.height * ts)))
+        # Exact blocks when zoomed in, averaged blocks (level of detail) when tiles are sub-pixel
+        scale = pygame.transform.scale if ts >= 1 else pygame.transform.smoothscale
+        origin = (round(x0 * ts - camera.x), round(y0 * ts - camera.y))
+        self.view.blit(scale(self.terrain.subsurface(area), size), origin)
+        self.view.blit(scale(overlay.surface.subsurface(area), size), origin)
         
-        if shape == 'start':
-            # Green circle for START
-            pygame.draw.circle(screen, (0, 200, 0), (cx, cy), 14)
-            pygame.draw.circle(screen, (0, 255, 0), (cx, cy), 14, 3)
-        elif shape == 'goal':
-            # Red square for GOAL
-            pygame.draw.rect(screen, (200, 0, 0), (cx - 14, cy - 14, 28, 28))
-            pygame.draw.rect(screen, (255, 0, 0), (cx - 14, cy - 14, 28, 28), 3)
-        elif shape == 'key':
-            # Gold key
-            pygame.draw.circle(screen, color, (cx, cy), 10)
-            pygame.draw.circle(screen, (200, 170, 0), (cx, cy), 10, 3)
-        elif shape == 'chest':
-            # Treasure chest
-            pygame.draw.rect(screen, color, (cx - 12, cy - 9, 24, 18))
-            pygame.draw.rect(screen, (100, 0, 130), (cx - 12, cy - 9, 24, 18), 3)
+        if ts >= GRID_LINE_ZOOM:
+            # Each tile keeps its own 1px border, as in the original tile drawing
+            bottom, right = min(camera.view_height, y1 * ts - camera.y), min(camera.view_width, x1 * ts - camera.x)
+            for c in range(x0, x1):
+                for px in (c * ts - camera.x, (c + 1) * ts - 1 - camera.x):
+                    pygame.draw.line(self.view, (0, 0, 0), (px, 0), (px, bottom))
+            for r in range(y0, y1):
+                for py in (r * ts - camera.y, (r + 1) * ts - 1 - camera.y):
+                    pygame.draw.line(self.view, (0, 0, 0), (0, py), (right, py))
+    
+    def patch_cell(self, camera, overlay, x, y):
+        # Repaint one tile of the cached view after its explored shading changed
+        rect = camera.cell_rect(x, y)
+        tr, tg, tb, _ = self.terrain.get_at((x, y))
+        orr, og, ob, oa = overlay.surface.get_at((x, y))
+        a = oa / 255
+        self.view.fill((round(tr * (1 - a) + orr * a), round(tg * (1 - a) + og * a), round(tb * (1 - a) + ob * a)), rect)
+        if camera.tile_size >= GRID_LINE_ZOOM:
+            pygame.draw.rect(self.view, (0, 0, 0), rect, 1)
+        return rect
+    
+    def render_decorations(self, camera, path):
+        self.decorations.fill((0, 0, 0, 0))
+        ts = camera.tile_size
         
-        # Label
-        font_small = pygame.font.SysFont("Arial", 11, bold=True)
-        label_surf = font_small.render(label, True, (255, 255, 255))
-        label_rect = label_surf.get_rect(center=(cx, cy + 22))
-        pygame.draw.rect(screen, (0, 0, 0), label_rect.inflate(6, 2))
-        screen.blit(label_surf, label_rect)
-    
-    draw_icon(start, C_SHIP, 'start', 'START')
-    draw_icon(goal, (200, 0, 0), 'goal', 'GOAL')
-    draw_icon(key, C_KEY, 'key', 'KEY')
-    draw_icon(chest, C_CHEST, 'chest', 'CHEST')
-    
-    # Draw animated pirate moving along the path
+        # Draw final path, only the runs of points near the viewport
+        if path and len(path) > 1:
+            x0, y0, x1, y1 = camera.visible_tiles()
+            width = max(1, round(5 * ts / GRID_SIZE))
+            run = []
+            for p in path:
+                if x0 - 1 <= p[0] <= x1 and y0 - 1 <= p[1] <= y1:
+                    run.append(camera.tile_center(p[0], p[1]))
+                    continue
+                if len(run) > 1:
+                    pygame.draw.lines(self.decorations, C_PATH, False, run, width)
+                run = []
+            if len(run) > 1:
+                pygame.draw.lines(self.decorations, C_PATH, False, run, width)
+        
+        # Draw icons
+        start, goal, key, chest = self.waypoints
+        for pos, color, shape, label in [(start, C_SHIP, 'start', 'START'), (goal, (200, 0, 0), 'goal', 'GOAL'),
+                                         (key, C_KEY, 'key', 'KEY'), (chest, C_CHEST, 'chest', 'CHEST')]:
+            if camera.is_visible(pos[0], pos[1]):
+                draw_icon(self.decorations, camera.tile_center(pos[0], pos[1]), color, shape, label)
+
+
+def draw_map(screen, layers, camera, search_data, overlay, path, animate_step):
+    # Composite the cached layers and return the screen rects that changed.
+    # Only newly explored visible cells and the old/new spots of the moving parts are
+    # repainted, unless the camera, map, path or explored overlay changed.
+    ts = camera.tile_size
+    full = camera.version != layers.camera_version or layers.needs_full_redraw
+    if full or path is not layers.path:
+        layers.render_decorations(camera, path)
+        layers.path = path
+        full = True
+    if full or overlay.needs_full_redraw or (ts < 1 and overlay.dirty):
+        # At sub-pixel zoom many tiles share a screen pixel, so re-scale the visible region instead
+        layers.render_view(camera, overlay)
+        full = True
+    else:
+        patched = [layers.patch_cell(camera, overlay, x, y) for x, y in overlay.dirty if camera.is_visible(x, y)]
+    layers.camera_version = camera.version
+    
+    dynamic = []
+    
+    # Current frontier node
+    highlight = None
+    if search_data and search_data.get('current_node'):
+        x, y, _, _ = search_data['current_node'].state
+        if camera.is_visible(x, y):
+            highlight = camera.cell_rect(x, y).inflate(-4, -4) if ts >= GRID_LINE_ZOOM else camera.cell_rect(x, y)
+            dynamic.append(camera.cell_rect(x, y))
+    
+    # Animated pirate moving along the path
+    pirate = None
     if path and animate_step > 0:
         current_index = min((animate_step - 1) // 10, len(path) - 1)
         pirate_pos = path[current_index]
-        px = pirate_pos[0] * GRID_SIZE + GRID_SIZE // 2
-        py = pirate_pos[1] * GRID_SIZE + GRID_SIZE // 2
-        
-        pygame.draw.circle(screen, (0, 0, 0), (px, py), 10)
+        if camera.is_visible(pirate_pos[0], pirate_pos[1]):
+            pirate = camera.tile_center(pirate_pos[0], pirate_pos[1])
+            dynamic.append(pygame.Rect(pirate[0] - 10, pirate[1] - 10, 21, 21).union(camera.cell_rect(*pirate_pos[:2])))
+    
+    dirty = [layers.view.get_rect()] if full else patched + layers.last_dynamic + dynamic
+    layers.needs_full_redraw = overlay.needs_full_redraw = False
+    overlay.dirty = []
+    layers.last_dynamic = dynamic
+    
+    for rect in dirty:
+        screen.set_clip(rect)
+        screen.blit(layers.view, rect.topleft, rect)
+        if highlight:
+            pygame.draw.rect(screen, C_FRONTIER, highlight, max(1, min(4, round(ts / 10))))
+        screen.blit(layers.decorations, rect.topleft, rect)
+        if pirate:
+            pygame.draw.circle(screen, (0, 0, 0), pirate, max(2, min(10, round(ts / 4))))
+    screen.set_clip(None)
+    return dirty
 
 
-def draw_sidebar(screen, current_algo, search_data, results_ucs, results_astar):
+def stepper_mode(stepper):
+    if isinstance(stepper, ProcessStepper):
+        return "worker process"
+    return "worker" if isinstance(stepper, BackgroundStepper) else "UI thread"
+
+
+def draw_sidebar(screen, current_algo, search_data, results_ucs, results_astar, anytime_solutions, stepper,
+                 search_stats=None, compare_panes=None):
     panel = pygame.Rect(MAP_WIDTH, 0, SIDEBAR_WIDTH, SCREEN_HEIGHT)
     pygame.draw.rect(screen, (25, 25, 35), panel)
     
     # Fonts
-    font_title = pygame.font.SysFont("Arial", 28, bold=True)
-    font_head = pygame.font.SysFont("Arial", 20, bold=True)
-    font_text = pygame.font.SysFont("Arial", 16)
-    font_small = pygame.font.SysFont("Arial", 14)
+    font_title = get_font(28, bold=True)
+    font_head = get_font(20, bold=True)
+    font_text = get_font(16)
+    font_small = get_font(14)
     
     x = MAP_WIDTH + 20
     y = 20
@@ -237,11 +523,15 @@ def draw_sidebar(screen, current_algo, search_data, results_ucs, results_astar):
     y += 28
     
     controls = [
-        ("[C] Compare Both", (200, 200, 200)),
+        ("[C] Compare Side by Side", (200, 200, 200)),
         ("[U] UCS Only", (200, 200, 200)),
         ("[A] A* Only", (200, 200, 200)),
+        ("[W] Anytime A*", (200, 200, 200)),
         ("[R] New Map", (200, 200, 200)),
-        ("[SPACE] Fast", (200, 200, 200))
+        ("[SPACE] Fast", (200, 200, 200)),
+        ("[B] Background Worker", (200, 200, 200)),
+        ("[P] Compare in Processes", (200, 200, 200)),
+        ("[Arrows/Wheel/+/-/F] Pan, Zoom", (200, 200, 200))
     ]
     
     for text, color in controls:
@@ -254,7 +544,43 @@ def draw_sidebar(screen, current_algo, search_data, results_ucs, results_astar):
     if current_algo != "None":
         status_color = (0, 255, 150) if current_algo == "COMPARE" else (255, 200, 50)
         screen.blit(font_text.render(f"Running: {current_algo}", True, status_color), (x, y))
-        y += 30
+        y += 24
+        
+        # Search throughput under the current per-frame budget
+        if stepper:
+            text = f"{stepper.steps_per_sec:,.0f} steps/s ({stepper.budget_ms:g} ms/frame, {stepper_mode(stepper)})"
+            screen.blit(font_small.render(text, True, (150, 150, 150)), (x, y))
+            y += 22
+        
+        # Split compare view: live expansion rate, frontier and memory of both searches
+        if compare_panes:
+            first = compare_panes[0].stepper
+            text = f"{first.budget_ms:g} ms/frame each, {stepper_mode(first)}"
+            screen.blit(font_small.render(text, True, (150, 150, 150)), (x, y))
+            y += 22
+            for pane in compare_panes:
+                for text in pane.status_lines():
+                    screen.blit(font_small.render(text, True, (255, 255, 255)), (x, y))
+                    y += 20
+        
+        # Heap and heuristic counters of the current search
+        if search_stats:
+            stats = search_stats.to_dict()
+            text = (f"pushes {stats['pushes']:,}  stale pops {stats['stale_pops']:,}  "
+                    f"h evals {stats['heuristic_evals']:,}")
+            screen.blit(font_small.render(text, True, (150, 150, 150)), (x, y))
+            y += 22
+        y += 6
+    
+    # Anytime A*: cost and suboptimality bound of each improved path over time
+    if anytime_solutions:
+        screen.blit(font_head.render("Anytime A*", True, (100, 200, 255)), (x, y))
+        y += 28
+        for solution in anytime_solutions[-6:]:
+            text = f"{solution['elapsed']:.2f}s  cost {solution['cost']}  <= x{solution['bound']:.2f}"
+            screen.blit(font_small.render(text, True, (255, 255, 255)), (x + 5, y))
+            y += 20
+        y += 10
     
     # Comparison Results
     if results_ucs or results_astar:
@@ -297,31 +623,259 @@ def draw_sidebar(screen, current_algo, search_data, results_ucs, results_astar):
             screen.blit(font_small.render("optimal solution)", True, (150, 150, 150)), (x + 5, y))
 
 
+def draw_playback_sidebar(screen, player):
+    reader = player.reader
+    panel = pygame.Rect(MAP_WIDTH, 0, SIDEBAR_WIDTH, SCREEN_HEIGHT)
+    pygame.draw.rect(screen, (25, 25, 35), panel)
+    
+    font_title = get_font(28, bold=True)
+    font_head = get_font(20, bold=True)
+    font_text = get_font(16)
+    font_small = get_font(14)
+    
+    x = MAP_WIDTH + 20
+    y = 20
+    
+    screen.blit(font_title.render("Trace Playback", True, (255, 200, 50)), (x, y))
+    y += 45
+    
+    screen.blit(font_head.render("Controls", True, (100, 200, 255)), (x, y))
+    y += 28
+    controls = [
+        "[SPACE] Play / Pause",
+        "[BACKSPACE] Reverse",
+        "[ [ / ] ] Slower / Faster",
+        "[, / .] Step Back / Forward",
+        "[HOME/END/0-9] Seek",
+        "[Click/Drag Timeline] Scrub",
+        "[Arrows/Wheel/+/-/F] Pan, Zoom"
+    ]
+    for text in controls:
+        screen.blit(font_text.render(text, True, (200, 200, 200)), (x + 5, y))
+        y += 24
+    y += 15
+    
+    # Playback state
+    state = "Playing" if player.playing else "Paused"
+    direction = "backwards" if player.reverse else "forwards"
+    screen.blit(font_text.render(f"{reader.algorithm}: {state} {direction}", True, (255, 200, 50)), (x, y))
+    y += 24
+    screen.blit(font_small.render(f"{player.speed:,} events/s", True, (150, 150, 150)), (x, y))
+    y += 30
+    
+    # The search as of the current event
+    event = player.event
+    lines = [f"Event {player.position:,} / {reader.num_events:,}"]
+    if event:
+        x0, y0, has_key, has_treasure = event['state']
+        lines += [
+            f"Expanded: {event['expanded']:,}",
+            f"Frontier: {event['frontier_size']:,}",
+            f"{event['event'].capitalize()} ({x0}, {y0}) at g = {event['cost']}",
+            f"Key: {'yes' if has_key else 'no'}  Treasure: {'yes' if has_treasure else 'no'}"
+        ]
+    result = reader.result
+    if player.finished:
+        if result['status'] == 'success':
+            lines.append(f"Path Cost: {result['cost']}")
+        else:
+            lines.append(f"Search {result['status']}")
+    for text in lines:
+        screen.blit(font_text.render(text, True, (255, 255, 255)), (x + 5, y))
+        y += 24
+    
+    # Timeline with the playback head
+    pygame.draw.rect(screen, (60, 60, 75), TIMELINE_RECT)
+    if reader.num_events:
+        done = TIMELINE_RECT.width * player.position // reader.num_events
+        pygame.draw.rect(screen, (0, 180, 255), (TIMELINE_RECT.x, TIMELINE_RECT.y, done, TIMELINE_RECT.height))
+    pygame.draw.rect(screen, (200, 200, 200), TIMELINE_RECT, 1)
+
+
+def timeline_position(reader, mx):
+    # Event position under the mouse on the timeline bar
+    fraction = (mx - TIMELINE_RECT.x) / TIMELINE_RECT.width
+    return round(max(0.0, min(1.0, fraction)) * reader.num_events)
+
 
-def main():
+def run_playback(trace_path):
+    # Replays a recorded trace without running the search
+    reader = TraceReader(trace_path)
+    grid = reader.grid
+    cols, rows = len(grid[0]), len(grid)
+    
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption(f"Pirate Treasure Hunt - {os.path.basename(trace_path)}")
+    clock = pygame.time.Clock()
+    
+    camera = Camera(cols, rows)
+    if cols * GRID_SIZE > MAP_WIDTH or rows * GRID_SIZE > SCREEN_HEIGHT:
+        camera.fit()
+    layers = MapLayers(grid, reader.start, reader.goal, reader.key, reader.chest, camera)
+    overlay = ExploredOverlay(cols, rows)
+    player = TracePlayer(reader, overlay)
+    player.playing = True
+    scrubbing = False
+    animate_step = 0
+    
+    while True:
+        dt = clock.tick(60) / 1000
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    # Playing from an end starts over from the other one
+                    if not player.playing and player.position == (0 if player.reverse else reader.num_events):
+                        player.seek(reader.num_events if player.reverse else 0)
+                    player.playing = not player.playing
+                if event.key == pygame.K_BACKSPACE:
+                    player.reverse = not player.reverse
+                if event.key == pygame.K_LEFTBRACKET:
+                    player.set_speed(player.speed // 2)
+                if event.key == pygame.K_RIGHTBRACKET:
+                    player.set_speed(player.speed * 2)
+                if event.key == pygame.K_COMMA:
+                    player.playing = False
+                    player.seek(player.position - 1)
+                if event.key == pygame.K_PERIOD:
+                    player.playing = False
+                    player.seek(player.position + 1)
+                if event.key == pygame.K_HOME:
+                    player.seek(0)
+                if event.key == pygame.K_END:
+                    player.seek(reader.num_events)
+                if pygame.K_0 <= event.key <= pygame.K_9:
+                    player.seek(reader.num_events * (event.key - pygame.K_0) // 10)
+                
+                if event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    camera.zoom(1)
+                if event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    camera.zoom(-1)
+                if event.key == pygame.K_f:
+                    camera.fit()
+            
+            # Click or drag on the timeline to scrub
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and TIMELINE_RECT.collidepoint(event.pos):
+                scrubbing = True
+                player.playing = False
+                player.seek(timeline_position(reader, event.pos[0]))
+            if event.type == pygame.MOUSEMOTION and scrubbing:
+                player.seek(timeline_position(reader, event.pos[0]))
+            if event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                scrubbing = False
+            
+            if event.type == pygame.MOUSEWHEEL:
+                mx, my = pygame.mouse.get_pos()
+                if mx < MAP_WIDTH:
+                    camera.zoom(event.y, anchor=(mx, my))
+        
+        pressed = pygame.key.get_pressed()
+        dx = (pressed[pygame.K_RIGHT] - pressed[pygame.K_LEFT]) * PAN_SPEED
+        dy = (pressed[pygame.K_DOWN] - pressed[pygame.K_UP]) * PAN_SPEED
+        if dx or dy:
+            camera.pan(dx, dy)
+        
+        player.update(dt)
+        
+        # The final path (and the pirate walking it) appears once the playback reaches the end
+        path = reader.result.get('path', []) if player.finished else []
+        if path and animate_step < len(path) * 10:
+            animate_step += 1
+        elif not path:
+            animate_step = 0
+        
+        dirty = draw_map(screen, layers, camera, player.event, overlay, path, animate_step)
+        draw_playback_sidebar(screen, player)
+        pygame.display.update(dirty + [pygame.Rect(MAP_WIDTH, 0, SIDEBAR_WIDTH, SCREEN_HEIGHT)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pirate Treasure Hunt: UCS vs A* visualizer")
+    parser.add_argument('--width', type=int, default=COLS, help='map width in tiles')
+    parser.add_argument('--height', type=int, default=ROWS, help='map height in tiles')
+    parser.add_argument('--seed', type=int, help='map seed; [R] moves on to the next seed (default: random maps)')
+    parser.add_argument('--map', help='open a saved .pmap map file ([R] still generates new maps)')
+    parser.add_argument('--record', metavar='DIR', help='save a trace of each UCS/A* search to DIR/<algorithm>.ptrc')
+    parser.add_argument('--play', metavar='TRACE', help='replay a recorded .ptrc trace instead of searching')
+    args = parser.parse_args(argv)
+    if args.play:
+        return run_playback(args.play)
+    cols, rows, seed = args.width, args.height, args.seed
+    if args.map:
+        grid, start, key, chest, goal = load_map(args.map)
+        cols, rows = len(grid[0]), len(grid)
+    else:
+        grid, start, key, chest, goal = generate_map(cols, rows, seed)
+    
     pygame.init()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption("Pirate Treasure Hunt")
     clock = pygame.time.Clock()
     
     # Initialize map and problem
-    grid, start, key, chest, goal = generate_map()
     problem = PirateProblem(grid, start, key, chest, goal)
+    camera = Camera(cols, rows)
+    if cols * GRID_SIZE > MAP_WIDTH or rows * GRID_SIZE > SCREEN_HEIGHT:
+        camera.fit()
+    layers = MapLayers(grid, start, goal, key, chest, camera)
     
     # Search state
-    search_gen = None
+    stepper = None
+    search_stats = None
     search_data = None
+    overlay = ExploredOverlay(cols, rows)
     path = []
     current_algo = "None"
     running = False
     turbo = False
+    background = False
     animate_step = 0
     
     # Results storage
     results_ucs = None
     results_astar = None
-    compare_mode = False
-    compare_phase = 0  # 0: UCS, 1: A*
+    anytime_solutions = []
+    panes = None  # split compare view: the UCS and A* panes while comparing
+    processes = False
+    
+    def traced(search_gen, name):
+        # With --record, the search's events are written to a trace as they are consumed
+        if not args.record:
+            return search_gen
+        os.makedirs(args.record, exist_ok=True)
+        return record(search_gen, TraceWriter(os.path.join(args.record, f"{name}.ptrc"), problem, name))
+    
+    def restart(search_gen):
+        # Replace the running search; the per-frame budget follows the turbo setting
+        if stepper:
+            stepper.stop()
+        stepper_cls = BackgroundStepper if background else SearchStepper
+        return stepper_cls(search_gen, SEARCH_BUDGETS_MS[turbo])
+    
+    def compare_stepper(name):
+        # The two compare searches split the frame budget; with [P] each gets its own process
+        budget = SEARCH_BUDGETS_MS[turbo] / 2
+        if processes:
+            make_search = functools.partial(compare_search, name, [list(row) for row in grid],
+                                            start, key, chest, goal, args.record)
+            return ProcessStepper(make_search, budget)
+        search_gen = traced(ucs_search(problem) if name == 'ucs' else astar_search(problem), name)
+        return (BackgroundStepper if background else SearchStepper)(search_gen, budget)
+    
+    def close_panes():
+        # Leave the split view; the single map view is redrawn in full
+        for pane in panes or []:
+            pane.stop()
+        layers.needs_full_redraw = True
+        return None
+    
+    def view_cameras():
+        # Pan and zoom move both compare panes together
+        return [pane.camera for pane in panes] if panes else [camera]
     
     while True:
         # Event handling
@@ -333,101 +887,177 @@ def main():
             if event.type == pygame.KEYDOWN:
                 # New map
                 if event.key == pygame.K_r:
-                    grid, start, key, chest, goal = generate_map()
+                    if seed is not None:
+                        seed += 1
+                    grid, start, key, chest, goal = generate_map(cols, rows, seed)
                     problem = PirateProblem(grid, start, key, chest, goal)
-                    search_gen = None
+                    layers = MapLayers(grid, start, goal, key, chest, camera)
+                    if stepper:
+                        stepper.stop()
+                    stepper = None
+                    search_stats = None
                     search_data = None
+                    overlay.reset()
                     path = []
                     current_algo = "None"
                     running = False
                     animate_step = 0
                     results_ucs = None
                     results_astar = None
-                    compare_mode = False
+                    anytime_solutions = []
+                    panes = close_panes()
                 
-                # Toggle turbo mode
+                # Zoom around the view center, or fit the whole map
+                for view_camera in view_cameras():
+                    if event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                        view_camera.zoom(1)
+                    if event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                        view_camera.zoom(-1)
+                    if event.key == pygame.K_f:
+                        view_camera.fit()
+                
+                # Toggle turbo mode: switches the per-frame search budget
                 if event.key == pygame.K_SPACE:
                     turbo = not turbo
+                    if stepper:
+                        stepper.budget_ms = SEARCH_BUDGETS_MS[turbo]
+                    for pane in panes or []:
+                        pane.stepper.budget_ms = SEARCH_BUDGETS_MS[turbo] / 2
+                
+                # Run the next searches in a background worker thread
+                if event.key == pygame.K_b:
+                    background = not background
+                
+                # Run the next comparison's searches in two worker processes
+                if event.key == pygame.K_p:
+                    processes = not processes
                 
                 if event.key == pygame.K_u:
-                    search_gen = ucs_search(problem)
+                    search_stats = SearchStats()
+                    stepper = restart(traced(ucs_search(problem, stats=search_stats), 'ucs'))
                     search_data = None
+                    overlay.reset()
                     path = []
                     current_algo = "UCS"
                     running = True
                     animate_step = 0
-                    compare_mode = False
+                    panes = close_panes()
                 
                 if event.key == pygame.K_a:
-                    search_gen = astar_search(problem)
+                    search_stats = SearchStats()
+                    stepper = restart(traced(astar_search(problem, stats=search_stats), 'astar'))
                     search_data = None
+                    overlay.reset()
                     path = []
                     current_algo = "A*"
                     running = True
                     animate_step = 0
-                    compare_mode = False
+                    panes = close_panes()
                 
-                # Compare mode
+                if event.key == pygame.K_w:
+                    search_stats = None
+                    stepper = restart(anytime_search(problem))
+                    search_data = None
+                    overlay.reset()
+                    path = []
+                    anytime_solutions = []
+                    current_algo = "ARA*"
+                    running = True
+                    animate_step = 0
+                    panes = close_panes()
+                
+                # Compare mode: UCS and A* side by side, advanced together every frame
                 if event.key == pygame.K_c:
-                    compare_mode = True
-                    compare_phase = 0
+                    if stepper:
+                        stepper.stop()
+                    stepper = None
+                    search_stats = None
+                    close_panes()
+                    panes = [ComparePane("UCS", 0, grid, start, goal, key, chest),
+                             ComparePane("A*", 1, grid, start, goal, key, chest)]
+                    for pane, name in zip(panes, ('ucs', 'astar')):
+                        pane.stepper = compare_stepper(name)
                     results_ucs = None
                     results_astar = None
-                    search_gen = ucs_search(problem)
                     search_data = None
+                    overlay.reset()
                     path = []
                     current_algo = "COMPARE"
-                    running = True
+                    running = False
                     animate_step = 0
+            
+            # Mouse wheel zooms around the cursor (in either compare pane)
+            if event.type == pygame.MOUSEWHEEL:
+                mx, my = pygame.mouse.get_pos()
+                if panes:
+                    for pane in panes:
+                        if pane.rect.collidepoint(mx, my):
+                            for view_camera in view_cameras():
+                                view_camera.zoom(event.y, anchor=(mx - pane.rect.x, my))
+                elif mx < MAP_WIDTH:
+                    camera.zoom(event.y, anchor=(mx, my))
+        
+        # Arrow keys pan while held
+        pressed = pygame.key.get_pressed()
+        dx = (pressed[pygame.K_RIGHT] - pressed[pygame.K_LEFT]) * PAN_SPEED
+        dy = (pressed[pygame.K_DOWN] - pressed[pygame.K_UP]) * PAN_SPEED
+        if dx or dy:
+            for view_camera in view_cameras():
+                view_camera.pan(dx, dy)
         
-        # Run search algorithm
-        if running and search_gen:
-            try:
-                # Run multiple steps in turbo mode
-                steps = 5 if turbo else 1
-                for _ in range(steps):
-                    result = next(search_gen)
+        # Run search algorithm for this frame's time budget
+        if running and stepper:
+            for result in stepper.step():
+                if result['status'] == 'running':
+                    search_data = result
+                    overlay.apply(result)
                     
-                    if result['status'] == 'running':
-                        search_data = result
-                    elif result['status'] == 'success':
+                    # Anytime search: show each improved path as soon as it is found
+                    if result['event'] == 'solution':
                         path = result['path']
-                        running = False
-                        
-                        # Store results for comparison
-                        if compare_mode:
-                            if compare_phase == 0:
-                                results_ucs = result
-                                # Start A* next
-                                compare_phase = 1
-                                search_gen = astar_search(problem)
-                                running = True
-                                animate_step = 0
-                            else:
-                                results_astar = result
-                                compare_mode = False
-                        elif current_algo == "UCS":
-                            results_ucs = result
-                        elif current_algo == "A*":
-                            results_astar = result
-                        
-                        break
-                    else:
-                        running = False
-                        break
-            except StopIteration:
+                        anytime_solutions = result['solutions']
+                elif result['status'] == 'success':
+                    path = result['path']
+                    running = False
+                    
+                    # Store results for comparison
+                    if current_algo == "UCS":
+                        results_ucs = result
+                    elif current_algo == "A*":
+                        results_astar = result
+                    
+                    break
+                else:
+                    running = False
+                    break
+            
+            if stepper.done:
                 running = False
         
+        # Compare panes share the frame: each steps its own search for half the budget
+        for pane in panes or []:
+            result = pane.step()
+            if result and result['status'] == 'success':
+                if pane is panes[0]:
+                    results_ucs = result
+                else:
+                    results_astar = result
+        
         # Animate the pirate along the path
         if path and not running and animate_step < len(path) * 10:
             animate_step += 1
         
-        # Rendering
-        screen.fill((0, 0, 0))
-        draw_map(screen, grid, start, goal, key, chest, search_data, path, animate_step)
-        exit_btn = draw_sidebar(screen, current_algo, search_data, results_ucs, results_astar)
+        # Rendering: only the changed map regions and the sidebar are pushed to the display
+        if panes:
+            gap = pygame.Rect(PANE_WIDTH, 0, COMPARE_GAP, SCREEN_HEIGHT)
+            screen.fill((0, 0, 0), gap)
+            dirty = [gap] + [rect for pane in panes for rect in pane.draw(screen)]
+        else:
+            dirty = draw_map(screen, layers, camera, search_data, overlay, path, animate_step)
+        exit_btn = draw_sidebar(screen, current_algo, search_data, results_ucs, results_astar, anytime_solutions, stepper,
+                                search_stats, panes)
         
-        pygame.display.flip()
+        pygame.display.update(dirty + [pygame.Rect(MAP_WIDTH, 0, SIDEBAR_WIDTH, SCREEN_HEIGHT)])
         clock.tick(60)
 
 
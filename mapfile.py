@@ -0,0 +1,220 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+
+from problem import TERRAIN_COSTS, generate_map, unreachable_waypoints
+
+# Binary map file (.pmap): a fixed little-endian header followed by one terrain code per
+# cell, row by row. Header: magic, version, width, height and the start/key/chest/goal
+# positions as (x, y) pairs.
+MAP_MAGIC = b'PMAP'
+MAP_VERSION = 1
+MAP_HEADER = struct.Struct('<4sHxxII8I')
+
+# Terrain code stored per cell (index into this list)
+TERRAIN_CODES = ['SAND', 'JUNGLE', 'LAKE', 'LAVA']
+CODE_OF = {terrain: code for code, terrain in enumerate(TERRAIN_CODES)}
+
+# bytes.translate tables: terrain code -> cell cost as a signed byte, MovingAI char -> terrain code
+COST_TABLE = bytes(TERRAIN_COSTS[terrain] & 0xFF for terrain in TERRAIN_CODES) + bytes(256 - len(TERRAIN_CODES))
+MOVINGAI_TERRAIN = {'.': 'SAND', 'G': 'SAND', 'S': 'LAKE', 'W': 'LAKE'}  # anything else is blocked
+MOVINGAI_TABLE = bytes(CODE_OF[MOVINGAI_TERRAIN.get(chr(c), 'LAVA')] for c in range(256))
+
+SCENARIO_HEADER = '# pirate scenario 1'
+
+
+class MappedRow:
+    # One row of a MappedGrid, indexable like the list rows of a generated grid
+    def __init__(self, buffer, offset, width):
+        self.buffer = buffer
+        self.offset = offset
+        self.width = width
+    
+    def __len__(self):
+        return self.width
+    
+    def __getitem__(self, x):
+        return TERRAIN_CODES[self.buffer[self.offset + x]]
+    
+    def __setitem__(self, x, terrain):
+        self.buffer[self.offset + x] = CODE_OF[terrain]
+    
+    def __iter__(self):
+        return (TERRAIN_CODES[code] for code in self.buffer[self.offset:self.offset + self.width])
+
+
+class MappedGrid:
+    # Grid backed by a buffer of terrain codes (usually a copy-on-write mmap of a .pmap file).
+    # Behaves like the list-of-lists grid (grid[y][x], len, iteration, assignment), so cells
+    # are only decoded when they are actually read. Edits stay in memory.
+    def __init__(self, buffer, width, height):
+        self.buffer = buffer
+        self.width = width
+        self.height = height
+    
+    def __len__(self):
+        return self.height
+    
+    def __getitem__(self, y):
+        if not 0 <= y < self.height:
+            raise IndexError(y)
+        return MappedRow(self.buffer, y * self.width, self.width)
+    
+    def __iter__(self):
+        return (self[y] for y in range(self.height))
+    
+    def cell_costs(self):
+        # Raw cell_costs table for PirateProblem.compile_grid, translated in one pass
+        return bytes(self.buffer).translate(COST_TABLE)
+
+
+def map_bytes(grid, start, key, chest, goal):
+    # Contents of a .pmap file (also embedded as is in trace files)
+    if isinstance(grid, MappedGrid):
+        codes = bytes(grid.buffer)
+    else:
+        codes = bytes(CODE_OF[terrain] for row in grid for terrain in row)
+    header = MAP_HEADER.pack(MAP_MAGIC, MAP_VERSION, len(grid[0]), len(grid),
+                             *start, *key, *chest, *goal)
+    return header + codes
+
+
+def parse_map(data, name, size=None):
+    # (grid, start, key, chest, goal) from a buffer holding a .pmap block of `size` bytes
+    # (default: all of data); the grid's cells stay in data
+    magic, version, width, height, *positions = MAP_HEADER.unpack_from(data)
+    if magic != MAP_MAGIC or version != MAP_VERSION:
+        raise ValueError(f"{name} is not a version {MAP_VERSION} map file")
+    if (len(data) if size is None else size) != MAP_HEADER.size + width * height:
+        raise ValueError(f"{name} is truncated")
+    grid = MappedGrid(memoryview(data)[MAP_HEADER.size:MAP_HEADER.size + width * height], width, height)
+    start, key, chest, goal = (tuple(positions[i:i + 2]) for i in range(0, 8, 2))
+    return grid, start, key, chest, goal
+
+
+def save_map(path, grid, start, key, chest, goal):
+    with open(path, 'wb') as f:
+        f.write(map_bytes(grid, start, key, chest, goal))
+
+
+def load_map(path):
+    # Memory-map a .pmap file; returns (grid, start, key, chest, goal) like generate_map
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    return parse_map(data, path)
+
+
+def load_movingai_map(path):
+    # MovingAI benchmark grid (.map). Passable ground becomes SAND, swamp and water become
+    # LAKE, trees and out-of-bounds cells become LAVA. Movement stays 4-connected.
+    with open(path, 'rb') as f:
+        header = {}
+        while True:
+            line = f.readline().decode().strip()
+            if line == 'map':
+                break
+            if not line:
+                raise ValueError(f"{path} has no 'map' section")
+            name, value = line.split(None, 1)
+            header[name] = value
+        width, height = int(header['width']), int(header['height'])
+        rows = [f.readline().rstrip(b'\r\n') for _ in range(height)]
+    if any(len(row) != width for row in rows):
+        raise ValueError(f"{path} does not match its {width}x{height} header")
+    return MappedGrid(bytearray(b''.join(rows).translate(MOVINGAI_TABLE)), width, height)
+
+
+def load_scenario(path):
+    # Queries of a scenario file as dicts with 'map', 'start', 'key', 'chest', 'goal' and
+    # 'cost' (the recorded optimal cost, or None). Map paths are relative to the scenario.
+    # MovingAI .scen files are accepted too; their single start/goal query becomes a pirate
+    # query with the key and chest on the goal, and their octile costs are not kept.
+    base = os.path.dirname(path)
+    queries = []
+    with open(path) as f:
+        lines = [line.split() for line in f if line.strip() and not line.startswith('#')]
+    if lines and lines[0][0] == 'version':
+        for fields in lines[1:]:
+            start = (int(fields[4]), int(fields[5]))
+            goal = (int(fields[6]), int(fields[7]))
+            if start != goal:
+                queries.append({'map': os.path.join(base, fields[1]), 'start': start,
+                                'key': goal, 'chest': goal, 'goal': goal, 'cost': None})
+        return queries
+    for fields in lines:
+        coords = [int(value) for value in fields[1:9]]
+        start, key, chest, goal = (tuple(coords[i:i + 2]) for i in range(0, 8, 2))
+        queries.append({'map': os.path.join(base, fields[0]), 'start': start, 'key': key,
+                        'chest': chest, 'goal': goal,
+                        'cost': int(fields[9]) if len(fields) > 9 else None})
+    return queries
+
+
+def save_scenario(path, queries):
+    base = os.path.dirname(path)
+    with open(path, 'w') as f:
+        f.write(SCENARIO_HEADER + '\n')
+        f.write('# map start_x start_y key_x key_y chest_x chest_y goal_x goal_y [cost]\n')
+        for query in queries:
+            fields = [os.path.relpath(query['map'], base or '.')]
+            for name in ('start', 'key', 'chest', 'goal'):
+                fields.extend(query[name])
+            if query.get('cost') is not None:
+                fields.append(query['cost'])
+            f.write(' '.join(str(field) for field in fields) + '\n')
+
+
+def open_map(path):
+    # Grid of any supported map file
+    if path.endswith('.map'):
+        return load_movingai_map(path)
+    return load_map(path)[0]
+
+
+def random_queries(map_path, count, seed=None):
+    # Random solvable queries (distinct non-lava waypoints, all connected) on one map
+    grid = open_map(map_path)
+    rng = random.Random(seed)
+    width, height = len(grid[0]), len(grid)
+    queries = []
+    while len(queries) < count:
+        waypoints = []
+        while len(waypoints) < 4:
+            pos = (rng.randrange(width), rng.randrange(height))
+            if grid[pos[1]][pos[0]] != 'LAVA' and pos not in waypoints:
+                waypoints.append(pos)
+        if not unreachable_waypoints(grid, waypoints):
+            start, key, chest, goal = waypoints
+            queries.append({'map': map_path, 'start': start, 'key': key, 'chest': chest,
+                            'goal': goal, 'cost': None})
+    return queries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create map and scenario files")
+    commands = parser.add_subparsers(dest='command', required=True)
+    generate = commands.add_parser('generate', help='save a generated map as a .pmap file')
+    generate.add_argument('output')
+    generate.add_argument('--width', type=int, default=17)
+    generate.add_argument('--height', type=int, default=17)
+    generate.add_argument('--seed', type=int)
+    scenario = commands.add_parser('scenario', help='write random solvable queries for maps')
+    scenario.add_argument('output')
+    scenario.add_argument('maps', nargs='+', help='.pmap or MovingAI .map files')
+    scenario.add_argument('--queries', type=int, default=10, help='queries per map')
+    scenario.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+    
+    if args.command == 'generate':
+        save_map(args.output, *generate_map(args.width, args.height, seed=args.seed))
+    else:
+        queries = []
+        for map_path in args.maps:
+            queries.extend(random_queries(map_path, args.queries, args.seed))
+        save_scenario(args.output, queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import heapq
+
+# Open lists for the search engines (see algorithms.py, open_list=...). Entries are tuples
+# that start with (f, h): the heap orders whole tuples, so equal f goes to the lower h
+# (higher g, closer to the goal) and the rest of the tuple settles the remaining ties
+# deterministically. The bucket queue follows the same order.
+# Both count entries made stale by a cheaper push of the same state (superseded()) and,
+# given an is_live(entry) test, drop them all in one pass once they make up most of the list,
+# so stale copies do not pile up on maps with many re-discovered states.
+
+# Compact once more than this many entries are stale and they outnumber the live ones
+COMPACT_MIN_STALE = 1024
+
+
+class HeapOpenList:
+    # Binary heap of entry tuples (heapq); comparisons stay inside C tuple comparison
+    def __init__(self, is_live=None):
+        self.heap = []
+        self.is_live = is_live
+        self.stale = 0
+        self.compactions = 0
+    
+    def __len__(self):
+        return len(self.heap)
+    
+    def push(self, entry):
+        heapq.heappush(self.heap, entry)
+    
+    def pop(self):
+        return heapq.heappop(self.heap)
+    
+    def peek(self):
+        return self.heap[0]
+    
+    def superseded(self):
+        # One entry pushed earlier is now stale
+        self.stale += 1
+        if self.is_live and self.stale > COMPACT_MIN_STALE and 2 * self.stale > len(self.heap):
+            self.compact()
+    
+    def compact(self):
+        self.heap = [entry for entry in self.heap if self.is_live(entry)]
+        heapq.heapify(self.heap)
+        self.stale = 0
+        self.compactions += 1
+
+
+class BucketOpenList:
+    # Bucket queue for the small integer priorities of these maps: one bucket per f value,
+    # holding a list per h and a small heap of the h values present. Terrain costs are at
+    # most COST_LAKE, so the f cursor only moves a few values between buckets and the
+    # entries themselves are never compared. Ties within a list are last in, first out,
+    # matching the heap order for entries that carry a decreasing sequence number.
+    def __init__(self, is_live=None):
+        self.buckets = {}  # f -> ({h: entries}, heap of h)
+        self.cursor = 0  # lowest f with entries
+        self.size = 0
+        self.is_live = is_live
+        self.stale = 0
+        self.compactions = 0
+    
+    def __len__(self):
+        return self.size
+    
+    def push(self, entry):
+        f, h = entry[0], entry[1]
+        bucket = self.buckets.get(f)
+        if bucket is None:
+            self.buckets[f] = ({h: [entry]}, [h])
+            if f < self.cursor or not self.size:
+                self.cursor = f
+        else:
+            lists, levels = bucket
+            entries = lists.get(h)
+            if entries is None:
+                lists[h] = [entry]
+                heapq.heappush(levels, h)
+            else:
+                entries.append(entry)
+        self.size += 1
+    
+    def pop(self):
+        if not self.size:
+            raise IndexError("pop from an empty open list")
+        lists, levels = self.buckets[self.cursor]
+        h = levels[0]
+        entries = lists[h]
+        entry = entries.pop()
+        self.size -= 1
+        if not entries:
+            del lists[h]
+            heapq.heappop(levels)
+            if not levels:
+                del self.buckets[self.cursor]
+                self._advance()
+        return entry
+    
+    def _advance(self):
+        # Move the cursor up to the next non-empty bucket
+        if self.size:
+            buckets = self.buckets
+            cursor = self.cursor + 1
+            while cursor not in buckets:
+                cursor += 1
+            self.cursor = cursor
+    
+    def peek(self):
+        lists, levels = self.buckets[self.cursor]
+        return lists[levels[0]][-1]
+    
+    def superseded(self):
+        self.stale += 1
+        if self.is_live and self.stale > COMPACT_MIN_STALE and 2 * self.stale > self.size:
+            self.compact()
+    
+    def compact(self):
+        size = 0
+        for f in list(self.buckets):
+            lists, levels = self.buckets[f]
+            for h in list(lists):
+                entries = [entry for entry in lists[h] if self.is_live(entry)]
+                if entries:
+                    lists[h] = entries
+                    size += len(entries)
+                else:
+                    del lists[h]
+            if lists:
+                levels[:] = lists
+                heapq.heapify(levels)
+            else:
+                del self.buckets[f]
+        self.size = size
+        if self.buckets:
+            self.cursor = min(self.buckets)
+        self.stale = 0
+        self.compactions += 1
+
+
+OPEN_LISTS = {'heap': HeapOpenList, 'bucket': BucketOpenList}
@@ -0,0 +1,343 @@
+import copy
+import random
+from array import array
+from collections import deque, OrderedDict
+from itertools import accumulate
+
+from heuristic import pirate_heuristic, pirate_index_heuristic, TerrainHeuristic, CostToGoField
+
+# Terrain Movement Costs
+COST_SAND = 1
+COST_JUNGLE = 5
+COST_LAKE = 10
+
+# Sentinel cost for impassable cells in the compiled grid
+IMPASSABLE = -1
+
+TERRAIN_COSTS = {'SAND': COST_SAND, 'JUNGLE': COST_JUNGLE, 'LAKE': COST_LAKE, 'LAVA': IMPASSABLE}
+
+# 4-directional movement order shared by every successor generator
+DIRECTIONS = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+
+
+# Heuristic providers selectable per problem:
+# - 'manhattan': unit-cost distance through the remaining waypoints (heuristic.pirate_heuristic)
+# - 'terrain': exact staged cost-to-go from cached backward Dijkstra fields (heuristic.TerrainHeuristic)
+HEURISTIC_MODES = ['manhattan', 'terrain']
+
+# Cost-to-go fields are shared by every problem on the same compiled map and waypoint layout
+# (e.g. with_waypoints copies that only move the start). The least recently used ones are
+# dropped once more than COST_TO_GO_CACHE_MAPS layouts are cached.
+COST_TO_GO_CACHE_MAPS = 8
+_cost_to_go_cache = OrderedDict()
+
+# Compiled tables built by PirateProblem.compile_grid, with their array typecodes
+COMPILED_TABLES = [('cell_costs', 'b'), ('neighbor_offsets', 'i'), ('neighbor_ends', 'i'),
+                   ('neighbor_cells', 'i'), ('neighbor_costs', 'b')]
+
+
+class PirateProblem:
+    # tables: the COMPILED_TABLES of this grid, compiled elsewhere (e.g. views into shared
+    # memory, see batch.py), in place of compile_grid. Their terrain must not be edited.
+    def __init__(self, grid, start, key_pos, chest_pos, goal, heuristic_mode='manhattan', tables=None):
+        if heuristic_mode not in HEURISTIC_MODES:
+            raise ValueError(f"Unknown heuristic mode: {heuristic_mode}")
+        self.grid = grid
+        self.start = start
+        self.key_pos = key_pos
+        self.chest_pos = chest_pos
+        self.goal = goal
+        self.heuristic_mode = heuristic_mode
+        self.width = len(grid[0])
+        self.height = len(grid)
+        if tables is None:
+            self.compile_grid()
+        else:
+            for (name, _), table in zip(COMPILED_TABLES, tables):
+                setattr(self, name, table)
+            self.terrain_version = 0
+            self._compile_waypoints()
+    
+    def get_start_state(self):
+        return (self.start[0], self.start[1], False, False)
+    
+    def is_goal(self, state):
+        x, y, has_key, has_treasure = state
+        return has_treasure and (x, y) == self.goal
+    
+    def compile_grid(self):
+        # Flatten the terrain once per map into numeric tables:
+        # - cell_costs[y * W + x]: move cost into the cell, IMPASSABLE for lava
+        # - CSR adjacency: the passable neighbors of cell c are neighbor_cells[k] with
+        #   move cost neighbor_costs[k] for k in range(neighbor_offsets[c], neighbor_ends[c])
+        # Each cell owns a fixed block of slots (one per in-bounds neighbor) with the passable
+        # neighbors packed at the front, so set_terrain can patch the table in place.
+        width, height = self.width, self.height
+        if hasattr(self.grid, 'cell_costs'):
+            # Grids loaded from map files (mapfile.MappedGrid) translate their stored codes in one pass
+            self.cell_costs = array('b', self.grid.cell_costs())
+        else:
+            self.cell_costs = array('b', [TERRAIN_COSTS.get(terrain, COST_SAND)
+                                          for row in self.grid for terrain in row])
+        
+        # One slot per in-bounds neighbor: 4 inside, 3 on an edge, 2 in a corner
+        row_slots = [(x > 0) + (x < width - 1) for x in range(width)]
+        offsets = array('i', [0])
+        offsets.extend(accumulate(slots + (y > 0) + (y < height - 1)
+                                  for y in range(height) for slots in row_slots))
+        
+        self.neighbor_offsets = offsets
+        self.neighbor_ends = array('i', offsets[:-1])
+        self.neighbor_cells = array('i', [0]) * offsets[-1]
+        self.neighbor_costs = array('b', [0]) * offsets[-1]
+        for cell in range(width * height):
+            self._compile_cell(cell)
+        
+        self.terrain_version = 0
+        self._compile_waypoints()
+    
+    def _compile_waypoints(self):
+        width = self.width
+        self.key_cell = self.key_pos[1] * width + self.key_pos[0]
+        self.chest_cell = self.chest_pos[1] * width + self.chest_pos[0]
+        self.goal_cell = self.goal[1] * width + self.goal[0]
+        
+        # Distance fields depend on the terrain and waypoints, rebuilt on first use
+        self._terrain_heuristic = None
+    
+    def with_waypoints(self, start, key_pos, chest_pos, goal):
+        # Another query on the same map without recompiling it. The compiled tables are
+        # shared, so neither problem should have its terrain edited afterwards.
+        problem = copy.copy(self)
+        problem.start = start
+        problem.key_pos = key_pos
+        problem.chest_pos = chest_pos
+        problem.goal = goal
+        problem._compile_waypoints()
+        return problem
+    
+    def _compile_cell(self, cell):
+        # Refill the passable-neighbor block of one cell
+        y, x = divmod(cell, self.width)
+        k = self.neighbor_offsets[cell]
+        for dx, dy in DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < self.width and 0 <= ny < self.height):
+                continue
+            ncell = ny * self.width + nx
+            if self.cell_costs[ncell] == IMPASSABLE:
+                continue
+            self.neighbor_cells[k] = ncell
+            self.neighbor_costs[k] = self.cell_costs[ncell]
+            k += 1
+        self.neighbor_ends[cell] = k
+    
+    def neighbors(self, cell):
+        # In-bounds neighbor cells (passable or not), in DIRECTIONS order
+        y, x = divmod(cell, self.width)
+        return [(y + dy) * self.width + x + dx for dx, dy in DIRECTIONS
+                if 0 <= x + dx < self.width and 0 <= y + dy < self.height]
+    
+    def set_terrain(self, pos, terrain):
+        # Change one tile and patch the compiled tables in O(1): only the neighbor blocks
+        # that point into this cell change.
+        x, y = pos
+        cell = y * self.width + x
+        self.grid[y][x] = terrain
+        self.cell_costs[cell] = TERRAIN_COSTS.get(terrain, COST_SAND)
+        for ncell in self.neighbors(cell):
+            self._compile_cell(ncell)
+        self._terrain_heuristic = None
+        self.terrain_version += 1
+        # Fields of this map are stale for every layout (the tables are shared by copies)
+        forget_cost_to_go(self.cell_costs)
+    
+    def get_successors(self, state):
+        # Read straight from the CSR tables; nothing is kept on the problem, so repeated runs
+        # on one map do not accumulate memory (see memoized_successors for re-expanding searches)
+        x, y, has_key, has_treasure = state
+        width = self.width
+        cell = y * width + x
+        neighbor_cells = self.neighbor_cells
+        neighbor_costs = self.neighbor_costs
+        key_cell = self.key_cell
+        chest_cell = self.chest_cell
+        successors = []
+        for k in range(self.neighbor_offsets[cell], self.neighbor_ends[cell]):
+            ncell = neighbor_cells[k]
+            
+            # Update inventory flags
+            new_key = has_key or ncell == key_cell
+            new_treasure = has_treasure or (ncell == chest_cell and new_key)
+            
+            ny, nx = divmod(ncell, width)
+            successors.append(((nx, ny, new_key, new_treasure), neighbor_costs[k]))
+        return successors
+    
+    def memoized_successors(self):
+        # get_successors with a memo owned by the returned function, for searches that expand
+        # the same states many times (IDA*, ARA*); it is freed together with the search
+        memo = {}
+        get_successors = self.get_successors
+        
+        def successors(state):
+            result = memo.get(state)
+            if result is None:
+                result = memo[state] = get_successors(state)
+            return result
+        return successors
+    
+    def heuristic(self, state):
+        if self.heuristic_mode == 'terrain':
+            return self.terrain_heuristic().estimate(state)
+        return pirate_heuristic(state, self.key_pos, self.chest_pos, self.goal)
+    
+    def terrain_heuristic(self):
+        if self._terrain_heuristic is None:
+            self._terrain_heuristic = TerrainHeuristic(self)
+        return self._terrain_heuristic
+    
+    def cost_to_go(self):
+        # Exact cost-to-go field for this map and key/chest/goal layout (heuristic.CostToGoField),
+        # built once and then reused by every start: field.cost(state) and field.path(state).
+        # Cached entries hold on to their cell_costs table, so its id is not reused while cached.
+        cache_key = (id(self.cell_costs), self.key_cell, self.chest_cell, self.goal_cell)
+        entry = _cost_to_go_cache.get(cache_key)
+        if entry is None:
+            entry = _cost_to_go_cache[cache_key] = (self.cell_costs, CostToGoField(self))
+            if len(_cost_to_go_cache) > COST_TO_GO_CACHE_MAPS:
+                _cost_to_go_cache.popitem(last=False)
+        else:
+            _cost_to_go_cache.move_to_end(cache_key)
+        return entry[1]
+    
+    # Compact state encoding: ((y * W + x) << 2) | has_key << 1 | has_treasure
+    def encode_state(self, state):
+        x, y, has_key, has_treasure = state
+        return ((y * self.width + x) << 2) | (has_key << 1) | has_treasure
+    
+    def decode_state(self, index):
+        y, x = divmod(index >> 2, self.width)
+        return (x, y, bool(index & 2), bool(index & 1))
+    
+    def make_index_heuristic(self):
+        # Same estimate as heuristic(), evaluated directly on encoded states
+        if self.heuristic_mode == 'terrain':
+            return self.terrain_heuristic().index_heuristic()
+        return pirate_index_heuristic(self.width, self.key_pos, self.chest_pos, self.goal)
+
+
+def forget_cost_to_go(cell_costs):
+    # Drop the cached fields of every layout on the map with this cell_costs table
+    # (after a terrain edit, or before the buffer behind the table goes away)
+    for cache_key, (table, _) in list(_cost_to_go_cache.items()):
+        if table is cell_costs:
+            del _cost_to_go_cache[cache_key]
+
+
+# Terrain mix drawn per cell by generate_map, as cumulative probabilities (SAND fills the rest)
+TERRAIN_MIX = ['LAVA', 'JUNGLE', 'LAKE', 'SAND']
+TERRAIN_MIX_CUM = [0.12, 0.37, 0.45, 1.0]
+
+# Redraws generate_map(repair=False) makes before giving up on a solvable map
+MAX_MAP_ATTEMPTS = 100
+
+
+def unreachable_waypoints(grid, waypoints):
+    # Flood fill over non-lava cells from the first waypoint; returns the waypoints it misses
+    rows, cols = len(grid), len(grid[0])
+    open_cells = [terrain != 'LAVA' for row in grid for terrain in row]
+    sx, sy = waypoints[0]
+    seen = bytearray(rows * cols)
+    seen[sy * cols + sx] = 1
+    stack = [sy * cols + sx]
+    while stack:
+        cell = stack.pop()
+        y, x = divmod(cell, cols)
+        for dx, dy in DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < cols and 0 <= ny < rows:
+                ncell = ny * cols + nx
+                if open_cells[ncell] and not seen[ncell]:
+                    seen[ncell] = 1
+                    stack.append(ncell)
+    return [pos for pos in waypoints[1:] if not seen[pos[1] * cols + pos[0]]]
+
+
+def _carve_to(grid, source, target):
+    # Turn the fewest lava cells into sand so that source connects to target
+    # (0-1 BFS where stepping onto lava costs 1 and everything else is free)
+    rows, cols = len(grid), len(grid[0])
+    start = source[1] * cols + source[0]
+    lava = {start: 0}
+    parent = {start: None}
+    queue = deque([start])
+    while queue:
+        cell = queue.popleft()
+        y, x = divmod(cell, cols)
+        if (x, y) == target:
+            break
+        for dx, dy in DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < cols and 0 <= ny < rows:
+                ncell = ny * cols + nx
+                step = 1 if grid[ny][nx] == 'LAVA' else 0
+                if lava[cell] + step < lava.get(ncell, lava[cell] + step + 1):
+                    lava[ncell] = lava[cell] + step
+                    parent[ncell] = cell
+                    if step:
+                        queue.append(ncell)
+                    else:
+                        queue.appendleft(ncell)
+    
+    cell = target[1] * cols + target[0]
+    while cell is not None:
+        y, x = divmod(cell, cols)
+        if grid[y][x] == 'LAVA':
+            grid[y][x] = 'SAND'
+        cell = parent[cell]
+
+
+def generate_map(cols, rows, seed=None, repair=True):
+    # Procedurally generate terrain grid with:
+    # - Lava (impassable) ~12%
+    # - Jungle (cost 5) ~25%
+    # - Lake (cost 10) ~8%
+    # - Sand (cost 1) default
+    # Passing a seed makes the map reproducible (used by the benchmark runner)
+    # The returned map is always solvable: if lava cuts a waypoint off from the start, the
+    # fewest lava cells needed to reconnect it are turned into sand (repair=True), or the
+    # map is drawn again from the same random stream (repair=False), at most MAX_MAP_ATTEMPTS
+    # times before giving up with a RuntimeError.
+    rng = random.Random(seed)
+    
+    # Place start and goal at opposite corners
+    start = (2, 2)  # Top-left
+    goal = (cols - 3, rows - 3)  # Bottom-right
+    
+    # Place key and chest at other positions
+    key = (cols - 3, 2)  # Top-right
+    chest = (2, rows - 3)  # Bottom-left
+    
+    for _ in range(MAX_MAP_ATTEMPTS):
+        # Terrain generation: the whole map is drawn in one call instead of a random() per cell
+        cells = rng.choices(TERRAIN_MIX, cum_weights=TERRAIN_MIX_CUM, k=rows * cols)
+        grid = [cells[r * cols:(r + 1) * cols] for r in range(rows)]
+        
+        # Clear critical areas around the waypoints
+        for pos in [start, goal, key, chest]:
+            grid[pos[1]][pos[0]] = 'SAND'
+            for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (-1, -1), (1, -1), (-1, 1)]:
+                nx, ny = pos[0] + dx, pos[1] + dy
+                if 0 <= nx < cols and 0 <= ny < rows:
+                    grid[ny][nx] = 'SAND'
+        
+        # Connectivity check, so a search never has to exhaust the map to report failure
+        missing = unreachable_waypoints(grid, [start, key, chest, goal])
+        if not missing:
+            return grid, start, key, chest, goal
+        if repair:
+            for pos in missing:
+                _carve_to(grid, start, pos)
+            return grid, start, key, chest, goal
+    raise RuntimeError(f"No solvable {cols}x{rows} map in {MAX_MAP_ATTEMPTS} draws (try repair=True)")
@@ -0,0 +1,187 @@
+import functools
+import multiprocessing
+import queue
+import threading
+import time
+from collections import namedtuple
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Per-frame search time budgets in milliseconds: normal (watchable) and turbo (fill most of a 60 fps frame)
+SEARCH_BUDGETS_MS = (0.02, 12.0)
+
+# Background worker: events are shipped in batches to keep queue overhead low,
+# and the bounded queue stops the worker from running far ahead of the UI
+EVENT_BATCH = 256
+QUEUE_BATCHES = 64
+
+# Stand-in for the search's Node in events sent to another process: the UI only reads its
+# state, and pickling a real Node would copy its whole parent chain
+FrontierNode = namedtuple('FrontierNode', ['state'])
+
+
+def _put(events, stop, batch):
+    # Blocks while the UI is behind, but gives up once the stepper is stopped
+    while not stop.is_set():
+        try:
+            events.put(batch, timeout=0.05)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _stream(search_gen, put, report, portable=False):
+    # Worker loop of the thread and process steppers: ships the events in batches through
+    # put() (False once stopped) and calls report(produced, busy seconds) after each batch.
+    # Time spent blocked on a full queue does not count as busy.
+    started = time.perf_counter()
+    blocked = 0.0
+    produced = 0
+    batch = []
+    for result in search_gen:
+        if portable and result['status'] == 'running':
+            result = dict(result, current_node=result['current_node'] and FrontierNode(result['current_node'].state))
+            result.pop('explored_set', None)
+        batch.append(result)
+        if result['status'] != 'running':
+            break
+        if len(batch) >= EVENT_BATCH:
+            produced += len(batch)
+            report(produced, time.perf_counter() - started - blocked)
+            t0 = time.perf_counter()
+            if not put(batch):
+                return False
+            blocked += time.perf_counter() - t0
+            batch = []
+    produced += len(batch)
+    report(produced, time.perf_counter() - started - blocked)
+    return put(batch)
+
+
+class SearchStepper:
+    # Advances a search generator inside the UI thread for at most budget_ms per frame
+    # (always at least one step) and tracks the achieved steps per second.
+    def __init__(self, search_gen, budget_ms):
+        self.search_gen = search_gen
+        self.budget_ms = budget_ms
+        self.done = False
+        self.steps = 0
+        self.steps_per_sec = 0.0
+        self.busy_time = 0.0
+    
+    def step(self):
+        # Returns the events produced this frame; the last one is the final result once done
+        events = []
+        if self.done:
+            return events
+        started = time.perf_counter()
+        deadline = started + self.budget_ms / 1000
+        for result in self.search_gen:
+            events.append(result)
+            if result['status'] != 'running':
+                self.done = True
+                break
+            if time.perf_counter() >= deadline:
+                break
+        else:
+            self.done = True
+        self._record(len(events), time.perf_counter() - started)
+        return events
+    
+    def _record(self, count, elapsed):
+        self.steps += count
+        self.busy_time += elapsed
+        if self.busy_time > 0:
+            self.steps_per_sec = self.steps / self.busy_time
+    
+    def stop(self):
+        self.done = True
+
+
+class BackgroundStepper(SearchStepper):
+    # Runs the search generator in a worker thread that streams event batches through a
+    # queue; step() drains the queue for at most budget_ms per frame.
+    # steps_per_sec and busy_time here are the worker's own.
+    def __init__(self, search_gen, budget_ms):
+        super().__init__(search_gen, budget_ms)
+        self.queue = queue.Queue(maxsize=QUEUE_BATCHES)
+        self._stop = threading.Event()
+        self._pending = []
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+    
+    def _run(self):
+        _stream(self.search_gen, functools.partial(_put, self.queue, self._stop), self._report)
+    
+    def _report(self, produced, busy):
+        self.busy_time = busy
+        if busy > 0:
+            self.steps_per_sec = produced / busy
+    
+    def step(self):
+        events = []
+        if self.done:
+            return events
+        deadline = time.perf_counter() + self.budget_ms / 1000
+        while time.perf_counter() < deadline or not events:
+            if not self._pending:
+                try:
+                    self._pending = self.queue.get_nowait()
+                except queue.Empty:
+                    if not self._worker.is_alive() and self.queue.empty():
+                        self.done = True
+                    break
+                self._pending.reverse()
+            result = self._pending.pop()
+            events.append(result)
+            if result['status'] != 'running':
+                self.done = True
+                break
+        return events
+    
+    def stop(self):
+        self.done = True
+        self._stop.set()
+
+
+def _process_worker(make_search, events, stop, progress):
+    def report(produced, busy):
+        if busy > 0:
+            progress[0] = produced / busy
+        progress[1] = busy
+        if resource:
+            progress[2] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    
+    if not _stream(make_search(), functools.partial(_put, events, stop), report, portable=True):
+        # Stopped: exit without waiting for the UI to drain the queue
+        events.cancel_join_thread()
+
+
+class ProcessStepper(BackgroundStepper):
+    # Runs the search in a worker process, so it gets a core (and GIL) of its own.
+    # make_search must be picklable and returns the search generator when called in the
+    # worker. Events arrive like BackgroundStepper's, with current_node reduced to a
+    # FrontierNode; peak_rss_kb is the worker's peak resident memory (None if unknown).
+    def __init__(self, make_search, budget_ms):
+        SearchStepper.__init__(self, None, budget_ms)
+        context = multiprocessing.get_context('spawn')
+        self.queue = context.Queue(maxsize=QUEUE_BATCHES)
+        self._stop = context.Event()
+        self._pending = []
+        self._progress = context.Array('d', 3, lock=False)  # steps/s, busy seconds, peak RSS (KB)
+        self._worker = context.Process(target=_process_worker, daemon=True,
+                                       args=(make_search, self.queue, self._stop, self._progress))
+        self._worker.start()
+    
+    @property
+    def peak_rss_kb(self):
+        return self._progress[2] if resource else None
+    
+    def step(self):
+        events = super().step()
+        self.steps_per_sec, self.busy_time = self._progress[0], self._progress[1]
+        return events
@@ -0,0 +1,28 @@
+from problem import PirateProblem, generate_map
+
+# Fixed corpus of seeded maps: generate_map draws each map from its seed alone, so every run
+# (and every machine) sees the same maps. One non-square size catches width/height mix-ups.
+CORPUS_SIZES = [(10, 10), (17, 17), (24, 12), (32, 32)]
+CORPUS_SEEDS = range(4)
+CORPUS = [(width, height, seed) for width, height in CORPUS_SIZES for seed in CORPUS_SEEDS]
+
+
+def corpus_id(case):
+    width, height, seed = case
+    return f"{width}x{height}-seed{seed}"
+
+
+def make_problem(width, height, seed, heuristic_mode='manhattan'):
+    return PirateProblem(*generate_map(width, height, seed=seed), heuristic_mode=heuristic_mode)
+
+
+def path_cost(problem, path):
+    # Cost of a result path, checking that it is a real path from the start to a goal state
+    assert path[0] == problem.get_start_state()
+    assert problem.is_goal(path[-1])
+    cost = 0
+    for state, next_state in zip(path, path[1:]):
+        costs = dict(problem.get_successors(state))
+        assert next_state in costs, f"{next_state} is not a successor of {state}"
+        cost += costs[next_state]
+    return cost
@@ -0,0 +1,49 @@
+import batch
+from algorithms import field_solve, ucs_compact_solve
+from batch import ATTACHED_MAPS, BatchSolver, solve_batch
+from conftest import CORPUS, make_problem
+from problem import PirateProblem, generate_map
+
+
+def test_batch_workers_solve_on_shared_compiled_maps():
+    # Workers build their problems on the shared tables; results match a local solve
+    tasks = [generate_map(width, height, seed=seed) for width, height, seed in CORPUS[::3]]
+    tasks += tasks
+    rows = sorted(solve_batch(tasks, algorithm='astar-compact', workers=2, chunk_size=2),
+                  key=lambda row: row['task'])
+    assert [row['task'] for row in rows] == list(range(len(tasks)))
+    cases = CORPUS[::3] * 2
+    for row, case in zip(rows, cases):
+        assert row['status'] == 'success'
+        assert row['cost'] == ucs_compact_solve(make_problem(*case))['cost']
+
+
+def test_shared_maps_are_freed_once_their_chunks_complete():
+    # Maps with several chunks are shared and freed right after, single-chunk maps never are
+    grids = [generate_map(17, 17, seed=seed) for seed in range(3)]
+    tasks = [grids[0]] * 5 + [grids[1]] + [grids[0]] * 3 + [grids[2]] * 2
+    shared = []
+    with BatchSolver('astar-compact', workers=2, chunk_size=2) as solver:
+        share = solver._share
+        solver._share = lambda key, grid: shared.append(key) or share(key, grid)
+        rows = sorted(solver.solve(tasks), key=lambda row: row['task'])
+        assert not solver._blocks and not solver._block_users
+    assert set(shared) == {id(grids[0][0])}
+    optimal = [ucs_compact_solve(PirateProblem(*grid))['cost'] for grid in grids]
+    expected = [optimal[0]] * 5 + [optimal[1]] + [optimal[0]] * 3 + [optimal[2]] * 2
+    assert [row['cost'] for row in rows] == expected
+
+
+def test_workers_keep_a_bounded_number_of_maps_attached():
+    grids = [generate_map(10, 10, seed=seed) for seed in range(ATTACHED_MAPS + 2)]
+    with BatchSolver('field', workers=1) as solver:
+        for grid, *waypoints in grids:
+            # Cached cost-to-go fields hold the map's tables and must not keep the block mapped
+            base = batch._worker_problem(solver._share(id(grid), grid), 'manhattan')
+            assert field_solve(base.with_waypoints(*waypoints))['status'] == 'success'
+            del base
+            assert len(batch._attached) <= ATTACHED_MAPS
+        blocks = [block for block, _ in batch._attached.values()]
+        while batch._attached:
+            batch._detach(next(iter(batch._attached)))
+    assert all(block.buf is None for block in blocks)
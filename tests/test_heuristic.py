@@ -0,0 +1,54 @@
+from collections import deque
+
+import pytest
+
+from conftest import CORPUS, corpus_id, make_problem
+from problem import HEURISTIC_MODES
+
+
+def reachable_states(problem):
+    seen = {problem.get_start_state()}
+    queue = deque(seen)
+    while queue:
+        state = queue.popleft()
+        if problem.is_goal(state):
+            continue
+        for next_state, _ in problem.get_successors(state):
+            if next_state not in seen:
+                seen.add(next_state)
+                queue.append(next_state)
+    return seen
+
+
+@pytest.mark.parametrize('case', CORPUS, ids=corpus_id)
+@pytest.mark.parametrize('heuristic_mode', HEURISTIC_MODES)
+def test_heuristic_is_admissible_and_consistent(case, heuristic_mode):
+    # Checked on every reachable state against the exact cost-to-go field
+    problem = make_problem(*case, heuristic_mode=heuristic_mode)
+    field = problem.cost_to_go()
+    index_heuristic = problem.make_index_heuristic()
+    for state in reachable_states(problem):
+        h = problem.heuristic(state)
+        assert index_heuristic(problem.encode_state(state)) == h
+        if problem.is_goal(state):
+            assert h == 0
+            continue
+        true_cost = field.cost(state)
+        if true_cost is not None:
+            assert h <= true_cost, f"h{state} = {h} overestimates {true_cost}"
+        for next_state, action_cost in problem.get_successors(state):
+            h_next = problem.heuristic(next_state)
+            assert h <= action_cost + h_next, f"h drops by more than the step cost from {state} to {next_state}"
+
+
+@pytest.mark.parametrize('case', CORPUS, ids=corpus_id)
+def test_cost_to_go_field_survives_terrain_edits(case):
+    # A field held across set_terrain keeps answering for the terrain it was built on
+    problem = make_problem(*case)
+    field = problem.cost_to_go()
+    start = problem.get_start_state()
+    cost, path = field.cost(start), field.path(start)
+    problem.set_terrain(path[1][:2], 'LAVA')
+    assert field.cost(start) == cost
+    assert field.path(start) == path
+    assert problem.cost_to_go() is not field
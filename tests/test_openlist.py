@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+import openlist
+from algorithms import astar_solve, astar_search, astar_compact_solve, ucs_compact_solve
+from conftest import CORPUS, corpus_id, make_problem
+from openlist import HeapOpenList, BucketOpenList
+
+
+def test_bucket_queue_pops_in_heap_order():
+    rng = random.Random(0)
+    heap, bucket = HeapOpenList(), BucketOpenList()
+    seq = 0
+    for _ in range(5000):
+        if heap and rng.random() < 0.4:
+            assert bucket.peek() == heap.peek()
+            assert bucket.pop() == heap.pop()
+        else:
+            seq -= 1
+            entry = (rng.randint(0, 40), rng.randint(0, 12), seq)
+            heap.push(entry)
+            bucket.push(entry)
+        assert len(bucket) == len(heap)
+    while heap:
+        assert bucket.pop() == heap.pop()
+    with pytest.raises(IndexError):
+        bucket.pop()
+
+
+@pytest.mark.parametrize('open_list_class', [HeapOpenList, BucketOpenList])
+def test_compaction_drops_only_stale_entries(open_list_class, monkeypatch):
+    monkeypatch.setattr(openlist, 'COMPACT_MIN_STALE', 0)
+    live = {}
+    frontier = open_list_class(lambda entry: live[entry[2]] == entry[0])
+    for offset in (30, 20, 10):
+        for state in range(10):
+            if state in live:
+                frontier.superseded()
+            live[state] = offset - state
+            frontier.push((offset - state, 0, state))
+    assert frontier.compactions > 0
+    assert len(frontier) < 30
+    popped = [frontier.pop() for _ in range(len(frontier))]
+    assert [entry for entry in popped if live[entry[2]] == entry[0]] == sorted((10 - s, 0, s) for s in range(10))
+
+
+@pytest.mark.parametrize('case', CORPUS, ids=corpus_id)
+def test_open_lists_expand_in_the_same_order(case):
+    # Deterministic tie-breaking: heap and bucket queue expand the same states in the same order
+    orders = []
+    for open_list in ('heap', 'bucket'):
+        events = list(astar_search(make_problem(*case), open_list=open_list))
+        orders.append([event['state'] for event in events if event['status'] == 'running'])
+        assert events[-1]['cost'] == astar_compact_solve(make_problem(*case))['cost']
+    assert orders[0] == orders[1]
+
+
+@pytest.mark.parametrize('case', CORPUS, ids=corpus_id)
+def test_searches_stay_optimal_when_compacting_every_time(case, monkeypatch):
+    monkeypatch.setattr(openlist, 'COMPACT_MIN_STALE', 0)
+    optimal = ucs_compact_solve(make_problem(*case))['cost']
+    for open_list in ('heap', 'bucket'):
+        assert astar_solve(make_problem(*case), open_list=open_list)['cost'] == optimal
+        assert ucs_compact_solve(make_problem(*case), open_list=open_list)['cost'] == optimal
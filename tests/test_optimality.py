@@ -0,0 +1,129 @@
+import json
+import random
+
+import pytest
+
+from algorithms import astar_compact_solve, ucs_compact_solve, ida_solve
+import benchmark
+from benchmark import ALGORITHMS, APPROXIMATE
+from conftest import CORPUS, corpus_id, make_problem, path_cost
+from incremental import IncrementalPlanner
+from problem import HEURISTIC_MODES, PirateProblem, generate_map
+
+EDITS_PER_MAP = 5
+EDIT_TERRAINS = ['SAND', 'JUNGLE', 'LAKE', 'LAVA']
+
+# Layouts with waypoints sharing a cell, built from a map's own cleared (start, key, chest, goal)
+OVERLAPS = {
+    'start=key': lambda start, key, chest, goal: (key, key, chest, goal),
+    'key=chest': lambda start, key, chest, goal: (start, key, key, goal),
+    'chest=goal': lambda start, key, chest, goal: (start, key, goal, goal),
+    'start=chest': lambda start, key, chest, goal: (chest, key, chest, goal),
+    'start=key=chest': lambda start, key, chest, goal: (key, key, key, goal),
+}
+
+
+@pytest.mark.parametrize('case', CORPUS, ids=corpus_id)
+@pytest.mark.parametrize('heuristic_mode', HEURISTIC_MODES)
+def test_ucs_and_astar_costs_agree(case, heuristic_mode):
+    ucs = ALGORITHMS['ucs'](make_problem(*case, heuristic_mode=heuristic_mode))
+    astar = ALGORITHMS['astar'](make_problem(*case, heuristic_mode=heuristic_mode))
+    assert ucs['status'] == astar['status'] == 'success'
+    assert ucs['cost'] == astar['cost']
+    # A consistent heuristic never makes A* expand more than UCS
+    assert astar['expanded'] <= ucs['expanded']
+
+
+@pytest.mark.parametrize('case', CORPUS, ids=corpus_id)
+@pytest.mark.parametrize('algo_name', sorted(ALGORITHMS))
+def test_every_mode_finds_a_valid_optimal_path(case, algo_name):
+    optimal = ucs_compact_solve(make_problem(*case))['cost']
+    problem = make_problem(*case)
+    result = ALGORITHMS[algo_name](problem)
+    assert result['status'] == 'success'
+    assert path_cost(problem, result['path']) == result['cost']
+    if algo_name in APPROXIMATE:
+        assert result['cost'] >= optimal
+    else:
+        assert result['cost'] == optimal
+
+
+def overlap_problems():
+    # Every overlap on the smaller corpus maps, plus a start-on-key layout where skipping the
+    # step off the key makes the path 2 cheaper than the optimum
+    for case in CORPUS[:8]:
+        grid, *positions = generate_map(*case)
+        for name, overlap in OVERLAPS.items():
+            yield pytest.param(grid, overlap(*positions), id=f"{corpus_id(case)}-{name}")
+    yield pytest.param(generate_map(12, 10, seed=0)[0], ((3, 7), (3, 7), (2, 4), (8, 8)), id='12x10-seed0-start=key')
+
+
+@pytest.mark.parametrize('grid, positions', list(overlap_problems()))
+@pytest.mark.parametrize('algo_name', sorted(set(ALGORITHMS) - APPROXIMATE))
+def test_overlapping_waypoints_stay_optimal(grid, positions, algo_name):
+    # A ship starting on the key has no key yet: it must step off and back onto it
+    optimal = ucs_compact_solve(PirateProblem(grid, *positions))
+    problem = PirateProblem(grid, *positions)
+    result = ALGORITHMS[algo_name](problem)
+    assert result['status'] == optimal['status'] == 'success'
+    assert result['cost'] == optimal['cost']
+    assert path_cost(problem, result['path']) == result['cost']
+
+
+@pytest.mark.parametrize('grid, positions', list(overlap_problems()))
+@pytest.mark.parametrize('algo_name', sorted(APPROXIMATE))
+def test_approximate_modes_never_beat_the_optimum_with_overlapping_waypoints(grid, positions, algo_name):
+    optimal = ucs_compact_solve(PirateProblem(grid, *positions))
+    problem = PirateProblem(grid, *positions)
+    result = ALGORITHMS[algo_name](problem)
+    assert result['status'] == optimal['status'] == 'success'
+    assert result['cost'] >= optimal['cost']
+    assert path_cost(problem, result['path']) == result['cost']
+
+
+@pytest.mark.parametrize('case', CORPUS, ids=corpus_id)
+def test_incremental_replanning_matches_fresh_search(case):
+    problem = make_problem(*case)
+    planner = IncrementalPlanner(problem)
+    assert planner.plan()['cost'] == ucs_compact_solve(problem)['cost']
+    
+    width, height, seed = case
+    rng = random.Random(seed)
+    waypoints = {problem.start, problem.key_pos, problem.chest_pos, problem.goal}
+    for _ in range(EDITS_PER_MAP):
+        pos = (rng.randrange(width), rng.randrange(height))
+        if pos in waypoints:
+            continue
+        result = planner.apply_edits([(pos, rng.choice(EDIT_TERRAINS))])
+        fresh = ucs_compact_solve(problem)
+        assert result['status'] == fresh['status']
+        if fresh['status'] == 'success':
+            assert result['cost'] == fresh['cost']
+            assert path_cost(problem, result['path']) == result['cost']
+
+
+@pytest.mark.parametrize('case', CORPUS[:8], ids=corpus_id)
+def test_ida_stays_optimal_with_a_small_node_budget(case):
+    # Half the states A* expands: the table fills up and evicts, but the path stays optimal
+    optimal = astar_compact_solve(make_problem(*case))
+    budget = optimal['expanded'] // 2
+    result = ida_solve(make_problem(*case), node_budget=budget)
+    assert result['status'] == 'success' and result['cost'] == optimal['cost']
+    assert result['degraded']
+    assert result['peak_nodes'] <= budget + result['max_frontier']
+
+
+def test_ida_gives_up_after_max_expansions():
+    result = ida_solve(make_problem(32, 32, 0), node_budget=50, max_expansions=20000)
+    assert result['status'] == 'failure'
+    assert result['degraded']
+    assert result['expanded'] <= 20001
+
+
+def test_benchmark_node_budget_leaves_the_shared_registry_alone(tmp_path):
+    ida = ALGORITHMS['ida']
+    output = tmp_path / 'runs.json'
+    benchmark.main(['--seeds', '0', '--algorithms', 'ida', '--node-budget', '300', '--no-memory',
+                    '--format', 'json', '--output', str(output)])
+    assert ALGORITHMS['ida'] is ida
+    assert json.loads(output.read_text())['runs'][0]['degraded']
@@ -0,0 +1,113 @@
+import gc
+import heapq
+import json
+import os
+import time
+
+import pytest
+
+from benchmark import ALGORITHMS
+from conftest import CORPUS_SEEDS, make_problem
+
+# Expansion counts and timings of every search mode on the seeded corpus, checked against
+# tests/perf_baselines.json. Expansions are deterministic, so any growth past the tolerance
+# is a real change in search behaviour. Timings are stored relative to a fixed pure-Python
+# calibration workload measured right before each algorithm, so baselines carry across
+# machines; they are still noisier, hence the wider default tolerance.
+# Regenerate the baselines after an intended change with PERF_UPDATE_BASELINES=1.
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'perf_baselines.json')
+PERF_SIZES = [(17, 17), (32, 32)]
+REPEATS = 5  # timings are the best of this many runs, each on a freshly built problem
+
+UPDATE = os.environ.get('PERF_UPDATE_BASELINES') == '1'
+EXPANSION_TOLERANCE = float(os.environ.get('PERF_EXPANSION_TOLERANCE', '0.05'))
+TIME_TOLERANCE = float(os.environ.get('PERF_TIME_TOLERANCE', '1.0'))
+
+
+def _calibration_workload():
+    # Dijkstra on a 60x60 grid with plain tuples: heap, dict and loop costs like the searches'
+    size = 60
+    dist = {(0, 0): 0}
+    frontier = [(0, 0, 0)]
+    while frontier:
+        d, x, y = heapq.heappop(frontier)
+        if d > dist[(x, y)]:
+            continue
+        for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if 0 <= nx < size and 0 <= ny < size:
+                nd = d + 1 + (nx * 7 + ny * 13) % 5
+                if nd < dist.get((nx, ny), nd + 1):
+                    dist[(nx, ny)] = nd
+                    heapq.heappush(frontier, (nd, nx, ny))
+
+
+def timed(fn, *args):
+    # (result, seconds) with the garbage collector paused, so its pauses do not land in one run
+    gc.collect()
+    gc.disable()
+    try:
+        t0 = time.perf_counter()
+        result = fn(*args)
+        return result, time.perf_counter() - t0
+    finally:
+        gc.enable()
+
+
+def calibration_time():
+    return min(timed(_calibration_workload)[1] for _ in range(REPEATS))
+
+
+@pytest.fixture(scope='module')
+def baselines():
+    stored = {'expanded': {}, 'time': {}}
+    if os.path.exists(BASELINES_PATH):
+        with open(BASELINES_PATH) as f:
+            stored = json.load(f)
+    measured = {'expanded': {}, 'time': {}}
+    yield stored, measured
+    if UPDATE:
+        stored['expanded'].update(measured['expanded'])
+        stored['time'].update(measured['time'])
+        with open(BASELINES_PATH, 'w') as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+
+@pytest.mark.parametrize('algo_name', sorted(ALGORITHMS))
+def test_no_performance_regression(algo_name, baselines):
+    stored, measured = baselines
+    solve = ALGORITHMS[algo_name]
+    calibration = calibration_time()
+    failures = []
+    for width, height in PERF_SIZES:
+        total = 0.0
+        for seed in CORPUS_SEEDS:
+            key = f"{algo_name}/{width}x{height}/seed{seed}"
+            times = []
+            for _ in range(REPEATS):
+                result, elapsed = timed(solve, make_problem(width, height, seed))
+                times.append(elapsed)
+            total += min(times)
+            expanded = result['expanded']
+            measured['expanded'][key] = expanded
+            baseline = stored['expanded'].get(key)
+            if baseline is None:
+                failures.append(f"{key}: no baseline")
+            elif expanded > baseline * (1 + EXPANSION_TOLERANCE):
+                failures.append(f"{key}: {expanded} expansions, baseline {baseline}")
+        
+        # Time relative to the calibration workload, summed over the seeds
+        key = f"{algo_name}/{width}x{height}"
+        relative = total / calibration
+        measured['time'][key] = relative
+        baseline = stored['time'].get(key)
+        if baseline is None:
+            failures.append(f"{key}: no timing baseline")
+        elif relative > baseline * (1 + TIME_TOLERANCE):
+            failures.append(f"{key}: {relative:.2f}x calibration time, baseline {baseline:.2f}x "
+                            f"(+{TIME_TOLERANCE:.0%} allowed)")
+    
+    if UPDATE:
+        pytest.skip("baselines updated")
+    assert not failures, "Performance regressions (rerun with PERF_UPDATE_BASELINES=1 if intended):\n" + \
+        "\n".join(failures)
@@ -0,0 +1,23 @@
+import pytest
+
+import problem
+from problem import generate_map, unreachable_waypoints
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_redrawn_maps_are_solvable(seed):
+    grid, start, key, chest, goal = generate_map(24, 24, seed=seed, repair=False)
+    assert not unreachable_waypoints(grid, [start, key, chest, goal])
+
+
+def test_redraw_gives_up_after_max_attempts(monkeypatch):
+    draws = []
+    
+    def always_cut_off(grid, waypoints):
+        draws.append(grid)
+        return waypoints[1:]
+    
+    monkeypatch.setattr(problem, 'unreachable_waypoints', always_cut_off)
+    with pytest.raises(RuntimeError):
+        generate_map(12, 12, seed=0, repair=False)
+    assert len(draws) == problem.MAX_MAP_ATTEMPTS
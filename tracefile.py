@@ -0,0 +1,293 @@
+import argparse
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+
+from algorithms import Node, ucs_search, astar_search
+from mapfile import map_bytes, parse_map, load_map
+from problem import PirateProblem, generate_map
+
+# Binary search trace (.ptrc): the event stream of one ucs_search/astar_search run.
+#   header | map block (.pmap layout) | events | checkpoint index | explored order | result
+# Each event is a kind byte followed by varints: zigzag deltas of the packed state index,
+# cost and frontier size against the previous event, the current frontier node and pushed
+# states as deltas from the event's own state, so most events take a handful of bytes.
+# Every checkpoint_every events the index stores the byte offset and the decoder state,
+# so any event is decoded from the nearest checkpoint. The explored order lists each
+# state's first expansion, which is all a viewer needs to rebuild the explored set.
+TRACE_MAGIC = b'PTRC'
+TRACE_VERSION = 1
+TRACE_HEADER = struct.Struct('<4sHxxIIII16sQQQQ')
+CHECKPOINT = struct.Struct('<QiiiII')
+RESULT_HEADER = struct.Struct('<BxxxiIII')
+CHECKPOINT_EVERY = 256
+
+# Event kind byte: low bits give the kind, NO_CURRENT marks an empty frontier
+EVENT_EXPAND = 0
+EVENT_STALE = 1
+EVENT_REEXPAND = 2  # expansion of a state that was expanded before (at a higher cost)
+NO_CURRENT = 4
+EVENT_NAMES = {EVENT_EXPAND: 'expand', EVENT_STALE: 'stale', EVENT_REEXPAND: 'expand'}
+
+RESULT_STATUSES = ['success', 'failure', 'incomplete']
+
+# Writer buffer flushed to disk once it grows past this many bytes
+FLUSH_BYTES = 1 << 16
+
+
+def _put(buf, value):
+    # Unsigned LEB128 varint of the zigzag-encoded value
+    value = value << 1 if value >= 0 else (-value << 1) - 1
+    while value > 0x7F:
+        buf.append(value & 0x7F | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _get(data, pos):
+    # (value, next position) of the varint at pos
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    return (value >> 1 if not value & 1 else -((value + 1) >> 1)), pos
+
+
+class TraceWriter:
+    # Streams the events of one search to a trace file; close() (or the final result event)
+    # writes the index and patches the header. Traces closed before a final result report
+    # the status 'incomplete'. The trace is written next to path and only moved into place
+    # on close, so a search restarted on the same path never shares a half-written file.
+    def __init__(self, path, problem, algorithm, checkpoint_every=CHECKPOINT_EVERY):
+        fd, self.temp_path = tempfile.mkstemp(suffix='.part', dir=os.path.dirname(path) or '.')
+        self.path = path
+        self.file = os.fdopen(fd, 'wb')
+        self.problem = problem
+        self.algorithm = algorithm
+        self.checkpoint_every = checkpoint_every
+        self.file.write(bytes(TRACE_HEADER.size))
+        self.file.write(map_bytes(problem.grid, problem.start, problem.key_pos, problem.chest_pos, problem.goal))
+        self.events_offset = self.file.tell()
+        self.buffer = bytearray()
+        self.flushed = 0
+        self.checkpoints = []
+        self.explored = set()
+        self.order = array('i')
+        self.num_events = 0
+        self.expanded = 0
+        self.last = (0, 0, 0)  # state index, cost and frontier size of the previous event
+        self.result = None
+    
+    def write(self, event):
+        if self.file is None:
+            return
+        if event['status'] != 'running':
+            self.result = event
+            self.close()
+            return
+        if event['event'] not in ('expand', 'stale'):
+            raise ValueError(f"Cannot record '{event['event']}' events")
+        
+        if self.num_events % self.checkpoint_every == 0:
+            self.checkpoints.append((self.flushed + len(self.buffer),) + self.last +
+                                    (self.expanded, len(self.order)))
+        encode = self.problem.encode_state
+        index = encode(event['state'])
+        kind = EVENT_STALE
+        if event['event'] == 'expand':
+            self.expanded += 1
+            if index in self.explored:
+                kind = EVENT_REEXPAND
+            else:
+                kind = EVENT_EXPAND
+                self.explored.add(index)
+                self.order.append(index)
+        current = event['current_node']
+        if current is None:
+            kind |= NO_CURRENT
+        
+        buf = self.buffer
+        last_index, last_cost, last_frontier = self.last
+        buf.append(kind)
+        _put(buf, index - last_index)
+        _put(buf, event['cost'] - last_cost)
+        _put(buf, event['frontier_size'] - last_frontier)
+        if current is not None:
+            _put(buf, encode(current.state) - index)
+        _put(buf, len(event['pushed']))
+        for state in event['pushed']:
+            _put(buf, encode(state) - index)
+        self.last = (index, event['cost'], event['frontier_size'])
+        self.num_events += 1
+        if len(buf) >= FLUSH_BYTES:
+            self._flush()
+    
+    def _flush(self):
+        self.file.write(self.buffer)
+        self.flushed += len(self.buffer)
+        self.buffer.clear()
+    
+    def close(self):
+        if self.file is None:
+            return
+        self._flush()
+        f = self.file
+        index_offset = f.tell()
+        for checkpoint in self.checkpoints:
+            f.write(CHECKPOINT.pack(*checkpoint))
+        order_offset = f.tell()
+        f.write(self.order.tobytes())
+        
+        result_offset = f.tell()
+        result = self.result
+        if result is None:
+            f.write(RESULT_HEADER.pack(RESULT_STATUSES.index('incomplete'), 0, self.expanded, 0, 0))
+        else:
+            path = array('i', [self.problem.encode_state(state) for state in result.get('path', [])])
+            f.write(RESULT_HEADER.pack(RESULT_STATUSES.index(result['status']), result.get('cost', 0),
+                                       result['expanded'], result['max_frontier'], len(path)))
+            f.write(path.tobytes())
+        
+        f.seek(0)
+        f.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, self.checkpoint_every, self.num_events,
+                                  len(self.order), len(self.checkpoints), self.algorithm.encode()[:16],
+                                  self.events_offset, index_offset, order_offset, result_offset))
+        f.close()
+        os.replace(self.temp_path, self.path)
+        self.file = None
+
+
+def record(search_gen, writer):
+    # Pass a search's events through unchanged while writing them to the trace
+    try:
+        for event in search_gen:
+            writer.write(event)
+            yield event
+    finally:
+        writer.close()
+
+
+class TraceReader:
+    # Random access to a trace file: event(n) decodes at most checkpoint_every events, and
+    # sequential reads continue from the previous one. explored_order[:event(n)['explored']]
+    # are the states explored after event n.
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        data = self.data
+        (magic, version, self.checkpoint_every, self.num_events, num_explored, num_checkpoints, algorithm,
+         self.events_offset, index_offset, order_offset, result_offset) = TRACE_HEADER.unpack_from(data)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            raise ValueError(f"{path} is not a version {TRACE_VERSION} trace file")
+        self.algorithm = algorithm.rstrip(b'\0').decode()
+        self.grid, self.start, self.key, self.chest, self.goal = parse_map(
+            data[TRACE_HEADER.size:self.events_offset], path)
+        self.width = len(self.grid[0])
+        
+        self.checkpoints = [CHECKPOINT.unpack_from(data, index_offset + i * CHECKPOINT.size)
+                            for i in range(num_checkpoints)]
+        self.explored_order = array('i', data[order_offset:order_offset + 4 * num_explored])
+        status, cost, expanded, max_frontier, path_len = RESULT_HEADER.unpack_from(data, result_offset)
+        self.result = {'status': RESULT_STATUSES[status], 'expanded': expanded, 'max_frontier': max_frontier}
+        if self.result['status'] == 'success':
+            path_offset = result_offset + RESULT_HEADER.size
+            path = array('i', data[path_offset:path_offset + 4 * path_len])
+            self.result.update(path=[self.decode(index) for index in path], cost=cost)
+        self._cursor = None
+    
+    def decode(self, index):
+        y, x = divmod(index >> 2, self.width)
+        return (x, y, bool(index & 2), bool(index & 1))
+    
+    def event(self, n):
+        # Event n in the shape of a live search event, plus 'step' (n) and 'explored'
+        # (number of distinct states explored after it)
+        if not 0 <= n < self.num_events:
+            raise IndexError(n)
+        cursor = self._cursor
+        if cursor is None or not cursor[0] <= n < cursor[0] + self.checkpoint_every:
+            offset, *last, expanded, explored = self.checkpoints[n // self.checkpoint_every]
+            cursor = (n - n % self.checkpoint_every, self.events_offset + offset, tuple(last), expanded, explored)
+        step, pos, last, expanded, explored = cursor
+        while True:
+            event, pos, last, expanded, explored = self._decode(step, pos, last, expanded, explored)
+            step += 1
+            if step > n:
+                break
+        self._cursor = (step, pos, last, expanded, explored)
+        return event
+    
+    def _decode(self, step, pos, last, expanded, explored):
+        data = self.data
+        last_index, last_cost, last_frontier = last
+        kind = data[pos]
+        delta, pos = _get(data, pos + 1)
+        index = last_index + delta
+        delta, pos = _get(data, pos)
+        cost = last_cost + delta
+        delta, pos = _get(data, pos)
+        frontier_size = last_frontier + delta
+        current = None
+        if not kind & NO_CURRENT:
+            delta, pos = _get(data, pos)
+            current = Node(self.decode(index + delta))
+        count, pos = _get(data, pos)
+        pushed = []
+        for _ in range(count):
+            delta, pos = _get(data, pos)
+            pushed.append(self.decode(index + delta))
+        kind &= ~NO_CURRENT
+        if kind != EVENT_STALE:
+            expanded += 1
+        if kind == EVENT_EXPAND:
+            explored += 1
+        event = {
+            'status': 'running',
+            'event': EVENT_NAMES[kind],
+            'state': self.decode(index),
+            'cost': cost,
+            'pushed': pushed,
+            'frontier_size': frontier_size,
+            'expanded': expanded,
+            'current_node': current,
+            'step': step,
+            'explored': explored
+        }
+        return event, pos, (index, cost, frontier_size), expanded, explored
+    
+    def close(self):
+        self.data.close()
+
+
+SEARCHES = {'ucs': ucs_search, 'astar': astar_search}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record a search trace without the UI")
+    parser.add_argument('output', help='trace file (.ptrc)')
+    parser.add_argument('--algorithm', choices=list(SEARCHES), default='astar')
+    parser.add_argument('--width', type=int, default=17)
+    parser.add_argument('--height', type=int, default=17)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--map', help='.pmap map file instead of a generated map')
+    parser.add_argument('--checkpoint-every', type=int, default=CHECKPOINT_EVERY)
+    args = parser.parse_args(argv)
+    
+    if args.map:
+        problem = PirateProblem(*load_map(args.map))
+    else:
+        problem = PirateProblem(*generate_map(args.width, args.height, seed=args.seed))
+    writer = TraceWriter(args.output, problem, args.algorithm, args.checkpoint_every)
+    for event in record(SEARCHES[args.algorithm](problem), writer):
+        pass
+    print(f"{writer.num_events} events, {len(writer.order)} explored states: {event['status']}")
+
+
+if __name__ == "__main__":
+    main()